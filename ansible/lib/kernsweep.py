@@ -35,7 +35,7 @@ author:
 notes:
     - Requires root privileges to remove packages
     - Always protects the running kernel and latest installed kernel
-    - Uses apt-get with --autoremove and --purge flags
+    - Uses apt-get with the --purge flag and an explicitly enumerated package list
 requirements:
     - python >= 3.7
     - dpkg (Debian/Ubuntu package management)
@@ -115,6 +115,8 @@ reboot_required:
     sample: true
 '''
 
+import os
+
 from ansible.module_utils.basic import AnsibleModule
 
 
@@ -124,13 +126,23 @@ from ansible.module_utils.basic import AnsibleModule
 import subprocess
 import os
 import re
-from typing import List, Set, Tuple, Optional
-from enum import Enum
-from dataclasses import dataclass, field
+import shutil
+import sys
+from typing import FrozenSet, List, Set, Tuple, Optional
+from enum import IntEnum
+from functools import cmp_to_key, lru_cache
+from dataclasses import dataclass
 
 
 # ===== From kernsweep/utils.py =====
 
+# dataclass(slots=True) drops the per-instance __dict__, shrinking each
+# instance and speeding attribute access (Python 3.10+); older
+# interpreters fall back to a regular dataclass
+DATACLASS_KWARGS = {"slots": True} if sys.version_info >= (3, 10) else {}
+# Bound locally so needs_reboot skips the os attribute walk per call and
+# tests can swap a stub with a single setattr
+_stat = os.stat
 def run_command(cmd: List[str], check: bool = True) -> Tuple[int, str, str]:
     """
     Run a shell command and capture output.
@@ -154,36 +166,55 @@ def run_command(cmd: List[str], check: bool = True) -> Tuple[int, str, str]:
         if check:
             raise
         return e.returncode, e.stdout or "", e.stderr or ""
-def parse_package_size(dpkg_output: str) -> int:
-    """
-    Parse package size from dpkg output.
-    Args:
-        dpkg_output: Output from dpkg-query
-    Returns:
-        int: Package size in bytes
-    """
-    # TODO: Implement when needed
-    raise NotImplementedError()
+@lru_cache(maxsize=1)
 def needs_reboot() -> bool:
     """
     Check if a system reboot is needed.
     Checks for the presence of /var/run/reboot-required file,
     which is created by Debian/Ubuntu systems when a reboot is needed.
+    The result is cached for the life of the process; callers that need
+    a fresh read (e.g. after removing packages in a long-lived process)
+    can call needs_reboot.cache_clear() first.
     Returns:
         bool: True if reboot is needed
     """
-    import os  # Local import to avoid unused import at module level
-    # Check for Debian/Ubuntu reboot-required file
-    reboot_required_file = "/var/run/reboot-required"
+    # Check for Debian/Ubuntu reboot-required file with a single stat;
+    # a missing (or unreadable) file means no reboot signal
     try:
-        return os.path.exists(reboot_required_file)
-    except (OSError, PermissionError):
-        # If we can't check, assume no reboot needed
+        _stat("/var/run/reboot-required")
+        return True
+    except OSError:
         return False
 
 # ===== From kernsweep/detector.py =====
 
-@dataclass
+# dpkg rewrites its status file on every install/remove, so its mtime is a
+# free invalidation key for the parsed package cache
+_DPKG_STATUS_FILE = "/var/lib/dpkg/status"
+_PACKAGE_CACHE_FILE = "/var/cache/kernsweep/packages.pkl"
+# Bump when the classification rules change so caches written by older
+# versions are discarded even if the dpkg status mtime is unchanged
+_PACKAGE_CACHE_VERSION = 1
+# Resolve the dpkg-query binary once at import so each spawn skips the
+# per-exec PATH walk
+_DPKG_QUERY = shutil.which("dpkg-query") or "/usr/bin/dpkg-query"
+def _is_versioned(version: bytes) -> bool:
+    """Cheap meta-package filter: versions start with a digit and contain a dot."""
+    return version[:1].isdigit() and b"." in version
+def _has_three_dot_components(version: bytes) -> bool:
+    """
+    Proxmox meta-package filter: at least 'digits.digits.digits' up front.
+    Matches versions like 6.17.2-1-pve while rejecting two-component meta
+    names like 6.14, using only C-level split/isdigit calls.
+    """
+    parts = version.split(b".", 2)
+    return (
+        len(parts) == 3
+        and parts[0].isdigit()
+        and parts[1].isdigit()
+        and parts[2][:1].isdigit()
+    )
+@dataclass(**DATACLASS_KWARGS)
 class KernelInfo:
     """
     Information about an installed kernel.
@@ -206,132 +237,299 @@ def get_running_kernel() -> str:
         RuntimeError: If unable to detect the running kernel
     """
     try:
-        # Use uname -r to get the kernel release version
-        result = subprocess.run(
-            ["uname", "-r"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        kernel_version = result.stdout.strip()
-        if not kernel_version:
-            raise RuntimeError("uname returned empty kernel version")
-        return kernel_version
-    except subprocess.CalledProcessError as e:
+        # uname(2) directly via os.uname() - no fork/exec of /bin/uname
+        kernel_version = os.uname().release
+    except (AttributeError, OSError) as e:
+        # AttributeError: os.uname() unavailable (non-POSIX platforms)
         raise RuntimeError(f"Failed to detect running kernel: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error detecting running kernel: {e}")
-def get_installed_kernels() -> List[KernelInfo]:
+    if not kernel_version:
+        raise RuntimeError("uname returned empty kernel version")
+    return kernel_version
+def _read_status_package_names():
     """
-    Get list of all installed kernel packages.
-    Supports both standard Debian/Ubuntu (linux-image-*) and Proxmox (proxmox-kernel-*) kernels.
+    Read installed kernel-related package names from dpkg's status database.
+    Parsing /var/lib/dpkg/status directly avoids the dpkg-query fork/exec.
+    Records are RFC822-style blocks separated by blank lines; only packages
+    in 'install ok installed' state whose names carry a kernel-related
+    prefix are returned.
     Returns:
-        List[KernelInfo]: List of installed kernels with metadata
+        List[bytes]: Installed linux-*/proxmox-* package names
+    Raises:
+        OSError: If the status file cannot be read
+    """
+    with open(_DPKG_STATUS_FILE, "rb") as f:
+        data = f.read()
+    names = []
+    for record in data.split(b"\n\n"):
+        if not record.startswith(b"Package: "):
+            continue
+        newline = record.find(b"\n")
+        name = record[len(b"Package: "):newline if newline != -1 else None]
+        # Cheap name prefilter before scanning the record for its status
+        if not (name.startswith(b"linux-") or name.startswith(b"proxmox-")):
+            continue
+        if b"\nStatus: install ok installed" not in record:
+            continue
+        names.append(name)
+    return names
+def _classify_package(package_name, add_kernel, add_header, running_version):
+    """
+    Classify one installed package name into the kernel or header bucket.
+    Shared by the status-file and dpkg-query paths. Non-kernel packages
+    and meta-packages are ignored.
+    Args:
+        package_name: Raw package name (bytes)
+        add_kernel: Bound append of the kernels list
+        add_header: Bound append of the headers list
+        running_version: Version of the running kernel, if known
+    """
+    # Dispatch on the first byte ('l' vs 'p') so each name only tries the
+    # prefixes in its family
+    first = package_name[:1]
+    if first == b"l":
+        if package_name.startswith(b"linux-image-"):
+            # Extract version from package name
+            # linux-image-5.15.0-82-generic -> 5.15.0-82-generic
+            version = package_name[len(b"linux-image-"):]
+            # Skip meta-packages (generic, lowlatency, etc. without version numbers)
+            if _is_versioned(version):
+                decoded_version = version.decode("ascii")
+                add_kernel(KernelInfo(
+                    version=decoded_version,
+                    package_name=package_name.decode("ascii"),
+                    is_running=(decoded_version == running_version),
+                ))
+        elif package_name.startswith(b"linux-headers-"):
+            # Extract version to check if it's a specific version package
+            version = package_name[len(b"linux-headers-"):]
+            # Skip meta-packages (generic, lowlatency, etc. without version numbers)
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+        elif package_name.startswith(b"linux-modules-"):
+            # Per-kernel module payloads (linux-modules- and
+            # linux-modules-extra-); enumerated explicitly so removal
+            # does not rely on apt's --autoremove closure scan
+            if package_name.startswith(b"linux-modules-extra-"):
+                version = package_name[len(b"linux-modules-extra-"):]
+            else:
+                version = package_name[len(b"linux-modules-"):]
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+    elif first == b"p":
+        if package_name.startswith(b"proxmox-kernel-"):
+            # Example: proxmox-kernel-6.17.2-1-pve-signed
+            version = package_name[len(b"proxmox-kernel-"):]
+            if version.endswith(b"-signed"):
+                version = version[:-len(b"-signed")]
+            # Proxmox versions are like: 6.17.2-1-pve (at least 3 components)
+            # Skip meta-packages like proxmox-kernel-6.14 (only 2 components)
+            if _has_three_dot_components(version):
+                decoded_version = version.decode("ascii")
+                add_kernel(KernelInfo(
+                    version=decoded_version,
+                    package_name=package_name.decode("ascii"),
+                    is_running=(decoded_version == running_version),
+                ))
+        elif package_name.startswith(b"proxmox-headers-"):
+            # Example: proxmox-headers-6.17.2-1-pve
+            version = package_name[len(b"proxmox-headers-"):]
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+def get_installed_packages(running_version: Optional[str] = None) -> Tuple[List[KernelInfo], List[str]]:
+    """
+    Get all installed kernel and header packages in a single pass.
+    Reads dpkg's status database directly when readable (no subprocess at
+    all); otherwise runs one dpkg-query invocation and scans its output
+    once. Either way, a single scan classifies
+    each installed package as a kernel image or a per-version companion
+    package (headers and module payloads). This avoids the cost of spawning
+    dpkg (and re-scanning its full output) separately per bucket.
+    Supports both standard Debian/Ubuntu (linux-image-*/linux-headers-*) and
+    Proxmox (proxmox-kernel-*/proxmox-headers-*) packages.
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running during the scan
+    Returns:
+        Tuple[List[KernelInfo], List[str]]: (installed kernels, header package names)
     Raises:
         RuntimeError: If unable to query installed packages
     """
+    kernels = []
+    headers = []
+    # Bind hot names to locals: the loops below then resolve them via
+    # LOAD_FAST instead of method lookups per package
+    add_kernel = kernels.append
+    add_header = headers.append
+    # Fast path: read dpkg's status database directly, skipping the
+    # dpkg-query fork/exec entirely; fall back to the subprocess if the
+    # file cannot be read or parsed
+    if os.access(_DPKG_STATUS_FILE, os.R_OK):
+        try:
+            for package_name in _read_status_package_names():
+                _classify_package(package_name, add_kernel, add_header, running_version)
+            return kernels, headers
+        except (OSError, UnicodeDecodeError):
+            kernels.clear()
+            headers.clear()
+    # Name globs push the filtering into dpkg itself, so only kernel and
+    # header packages ever cross the pipe instead of the whole database
+    cmd = [
+        _DPKG_QUERY, "-W", "-f=${db:Status-Abbrev} ${Package}\n",
+        "linux-image-*", "linux-headers-*", "linux-modules-*",
+        "proxmox-kernel-*", "proxmox-headers-*",
+    ]
     try:
-        # Query dpkg for installed kernel packages
-        # Format: package name, status
-        result = subprocess.run(
-            ["dpkg", "-l"],
-            capture_output=True,
-            text=True,
-            check=True,
+        # Query dpkg once for all installed packages, streaming its output
+        # so parsing overlaps with dpkg's execution and the full package
+        # list is never buffered in memory. The stream stays in bytes:
+        # package names are ASCII, so only the few matches get decoded
+        # instead of codec-scanning the whole output.
+        # Format: status abbreviation, package name
+        # stderr is discarded: dpkg-query prints a 'no packages found
+        # matching <glob>' line for every non-matching pattern (routine
+        # for the proxmox globs), which would otherwise leak to the user
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
         )
-        kernels = []
-        # Pattern to match linux-image packages
-        # Example: linux-image-5.15.0-82-generic
-        linux_pattern = re.compile(r'^ii\s+(linux-image-[\d\.\-]+\S*)\s+')
-        # Pattern to match proxmox-kernel packages
-        # Example: proxmox-kernel-6.17.2-1-pve-signed
-        proxmox_pattern = re.compile(r'^ii\s+(proxmox-kernel-([\d\.\-]+\S+?)(?:-signed)?)\s+')
-        for line in result.stdout.splitlines():
-            # Try linux-image pattern
-            match = linux_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                # Extract version from package name
-                # linux-image-5.15.0-82-generic -> 5.15.0-82-generic
-                version = package_name.replace("linux-image-", "")
-                # Skip meta-packages (generic, lowlatency, etc. without version numbers)
-                if re.match(r'^\d+\.', version):
-                    kernels.append(KernelInfo(
-                        version=version,
-                        package_name=package_name,
-                    ))
+        classify = _classify_package
+        for line in proc.stdout:
+            # Cheap two-byte prefilter rejects non-installed rows before
+            # any tokenization
+            if not line.startswith(b"ii"):
+                continue
+            # Expect: status abbreviation followed by package name; cap
+            # the split so trailing columns are never tokenized
+            parts = line.split(None, 2)
+            if len(parts) < 2 or parts[0] != b"ii":
                 continue
-            # Try proxmox-kernel pattern
-            match = proxmox_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                version = match.group(2)
-                # Proxmox versions are like: 6.17.2-1-pve (at least 3 components)
-                # Skip meta-packages like proxmox-kernel-6.14 (only 2 components)
-                if re.match(r'^\d+\.\d+\.\d+', version):
-                    kernels.append(KernelInfo(
-                        version=version,
-                        package_name=package_name,
-                    ))
-        # Return empty list if no kernels found (e.g., container/LXC environment)
-        return kernels
+            classify(parts[1], add_kernel, add_header, running_version)
+        proc.wait()
+        # dpkg-query exits 1 when a pattern matches no packages at all,
+        # which is routine (e.g. no proxmox-* on Debian/Ubuntu systems)
+        if proc.returncode not in (0, 1):
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        # Empty lists if no kernels found (e.g., container/LXC environment)
+        return kernels, headers
+    except FileNotFoundError:
+        # dpkg-query missing entirely - not a dpkg-based system
+        raise RuntimeError(
+            "kernsweep requires a dpkg-based system (dpkg-query not found)"
+        )
     except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to query installed kernels: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error querying installed kernels: {e}")
-def get_installed_headers() -> List[str]:
+        raise RuntimeError(f"Failed to query installed packages: {e}")
+    except (OSError, subprocess.SubprocessError, UnicodeDecodeError) as e:
+        # Only environment/data failures get the friendly wrapper; genuine
+        # bugs propagate unmasked
+        raise RuntimeError(f"Unexpected error querying installed packages: {e}")
+def get_installed_packages_cached(running_version: Optional[str] = None) -> Tuple[List[KernelInfo], List[str]]:
     """
-    Get list of all installed kernel header packages.
-    Supports both standard Debian/Ubuntu (linux-headers-*) and Proxmox (proxmox-headers-*) headers.
+    Get installed kernel and header packages, reusing an on-disk cache.
+    The parsed package lists change only when dpkg's status file does, so
+    they are cached keyed on its mtime. Repeated runs (e.g. idempotent
+    Ansible plays across a fleet) skip the dpkg subprocess and the full
+    output scan entirely; any cache problem falls back to a fresh query.
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running
     Returns:
-        List[str]: List of kernel header package names
+        Tuple[List[KernelInfo], List[str]]: (installed kernels, header package names)
     Raises:
         RuntimeError: If unable to query installed packages
     """
+    import pickle  # Deferred: only the caching path pays the import
+    status_mtime = None
     try:
-        # Query dpkg for installed header packages
-        result = subprocess.run(
-            ["dpkg", "-l"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        headers = []
-        # Pattern to match linux-headers packages
-        # Example: linux-headers-5.15.0-82-generic
-        linux_pattern = re.compile(r'^ii\s+(linux-headers-[\d\.\-]+\S*)\s+')
-        # Pattern to match proxmox-headers packages
-        # Example: proxmox-headers-6.17.2-1-pve
-        proxmox_pattern = re.compile(r'^ii\s+(proxmox-headers-[\d\.\-]+\S+)\s+')
-        for line in result.stdout.splitlines():
-            # Try linux-headers pattern
-            match = linux_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                # Extract version to check if it's a specific version package
-                version = package_name.replace("linux-headers-", "")
-                # Skip meta-packages (generic, lowlatency, etc. without version numbers)
-                if re.match(r'^\d+\.', version):
-                    headers.append(package_name)
-                continue
-            # Try proxmox-headers pattern
-            match = proxmox_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                version = package_name.replace("proxmox-headers-", "")
-                if re.match(r'^\d+\.', version):
-                    headers.append(package_name)
-        return headers
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to query installed headers: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error querying installed headers: {e}")
+        status_mtime = os.stat(_DPKG_STATUS_FILE).st_mtime
+        with open(_PACKAGE_CACHE_FILE, "rb") as f:
+            cache_version, cached_mtime, kernels, headers = pickle.load(f)
+        if cache_version == _PACKAGE_CACHE_VERSION and cached_mtime == status_mtime:
+            # Re-derive the running flag: the cache may have been written
+            # under a different (or unknown) running kernel
+            for kernel in kernels:
+                kernel.is_running = (kernel.version == running_version)
+            return kernels, headers
+    except (OSError, pickle.PickleError, EOFError, ValueError, AttributeError):
+        # Missing/stale/corrupt cache - fall through to a fresh query
+        pass
+    kernels, headers = get_installed_packages(running_version)
+    if status_mtime is not None:
+        try:
+            os.makedirs(os.path.dirname(_PACKAGE_CACHE_FILE), exist_ok=True)
+            # Write-then-rename keeps concurrent readers consistent
+            tmp_path = _PACKAGE_CACHE_FILE + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((_PACKAGE_CACHE_VERSION, status_mtime, kernels, headers), f)
+            os.replace(tmp_path, _PACKAGE_CACHE_FILE)
+        except OSError:
+            # Cache is best-effort only (e.g. unprivileged runs)
+            pass
+    return kernels, headers
+def get_installed_kernels(running_version: Optional[str] = None) -> List[KernelInfo]:
+    """
+    Get list of all installed kernel packages.
+    Supports both standard Debian/Ubuntu (linux-image-*) and Proxmox (proxmox-kernel-*) kernels.
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running during the scan
+    Returns:
+        List[KernelInfo]: List of installed kernels with metadata
+    Raises:
+        RuntimeError: If unable to query installed packages
+    """
+    kernels, _ = get_installed_packages(running_version)
+    return kernels
+def get_installed_headers() -> List[str]:
+    """
+    Get list of all installed kernel header and module packages.
+    Supports standard Debian/Ubuntu (linux-headers-*, linux-modules-*) and
+    Proxmox (proxmox-headers-*) per-version companion packages.
+    Returns:
+        List[str]: List of kernel header/module package names
+    Raises:
+        RuntimeError: If unable to query installed packages
+    """
+    _, headers = get_installed_packages()
+    return headers
 
 # ===== From kernsweep/analyzer.py =====
 
+def _looks_like_flavor(suffix: str) -> bool:
+    """
+    Check whether a version suffix looks like a platform/flavor identifier.
+    Flavors are alphanumeric with optional underscores ('generic', '2712',
+    'v8', 'amd64'). Version fragments such as '5.15' contain a dot and are
+    rejected by the same test, so no regex is needed on this inner-loop path.
+    """
+    return suffix.replace('_', '').isalnum()
+@lru_cache(maxsize=256)
+def _version_key(version: str) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Parse a kernel version string into a numerically comparable tuple.
+    Splits versions of the shape 'major.minor.patch-build-flavor' with plain
+    str.split, avoiding regex overhead on the hot comparison path. Results
+    are memoized: version strings repeat heavily across comparisons (and
+    across plays when the module stays resident under ansible-runner).
+    Args:
+        version: Kernel version string (e.g., '5.15.0-82-generic')
+    Returns:
+        Optional[Tuple[int, int, int, int]]: (major, minor, patch, build),
+            or None if the version does not match the expected format
+    """
+    head = version.split('-', 2)
+    release = head[0].split('.')
+    try:
+        return (int(release[0]), int(release[1]), int(release[2]), int(head[1]))
+    except (IndexError, ValueError):
+        return None
+@lru_cache(maxsize=256)
 def extract_base_version(version: str) -> Tuple[str, str]:
     """
     Extract base version and flavor from a kernel version string.
+    Pure and memoized: the same versions recur for the running/latest
+    kernels and again in the classification loop, so repeat calls are
+    cache hits.
     Splits version into base (numeric) part and flavor (platform/variant).
     Examples:
         '6.12.47+rpt-rpi-2712' -> ('6.12.47+rpt-rpi', '2712')
@@ -343,34 +541,43 @@ def extract_base_version(version: str) -> Tuple[str, str]:
     Returns:
         Tuple[str, str]: (base_version, flavor)
     """
-    # Split on last '-' to separate flavor
-    parts = version.rsplit('-', 1)
-    if len(parts) == 2:
-        base = parts[0]
-        flavor = parts[1]
-        # Check if the last part looks like a platform/flavor identifier
-        # Pure alphanumeric (may contain underscores), and doesn't start with a digit followed by dot
-        # This excludes things like "5.15" but includes "2712", "v8", "amd64", "generic"
-        if flavor.replace('_', '').isalnum() and not re.match(r'^\d+\.', flavor):
-            return (base, flavor)
+    # Split on last '-' to separate flavor; rpartition returns a tuple and
+    # signals "no separator" through the middle element, no length check
+    base, sep, flavor = version.rpartition('-')
+    # Check if the last part looks like a platform/flavor identifier
+    # This excludes things like "5.15" but includes "2712", "v8", "amd64", "generic"
+    if sep and _looks_like_flavor(flavor):
+        return (base, flavor)
     # No clear flavor separation, return whole version as base
     return (version, '')
-@dataclass
+@dataclass(frozen=True, **DATACLASS_KWARGS)
 class AnalysisResult:
     """
     Result of kernel analysis.
+    Immutable: the collection fields are stored as tuples (any iterable
+    is accepted at construction), so results are compact, safe to share,
+    and hashable for caching.
     Attributes:
         running_kernel: Version of the currently running kernel
         latest_kernel: Version of the latest installed kernel
-        obsolete_kernels: List of kernel packages safe to remove
-        obsolete_headers: List of header packages safe to remove
-        protected_kernels: List of kernels that must be kept
+        obsolete_kernels: Kernel packages safe to remove
+        obsolete_headers: Header packages safe to remove
+        protected_kernels: Kernels that must be kept
+        protected_versions: Versions of every protected kernel (exact and
+            base-version matches), as used for header matching
     """
     running_kernel: str
     latest_kernel: str
-    obsolete_kernels: List[str]
-    obsolete_headers: List[str]
-    protected_kernels: List[str]
+    obsolete_kernels: Tuple[str, ...]
+    obsolete_headers: Tuple[str, ...]
+    protected_kernels: Tuple[str, ...]
+    protected_versions: FrozenSet[str] = frozenset()
+    def __post_init__(self):
+        # Normalize the collection fields to tuples (frozen dataclass,
+        # hence object.__setattr__)
+        object.__setattr__(self, 'obsolete_kernels', tuple(self.obsolete_kernels))
+        object.__setattr__(self, 'obsolete_headers', tuple(self.obsolete_headers))
+        object.__setattr__(self, 'protected_kernels', tuple(self.protected_kernels))
 def compare_kernel_versions(version1: str, version2: str) -> int:
     """
     Compare two kernel version strings.
@@ -382,36 +589,24 @@ def compare_kernel_versions(version1: str, version2: str) -> int:
     Returns:
         int: -1 if version1 < version2, 0 if equal, 1 if version1 > version2
     """
-    # Extract numeric components from version strings
-    # Pattern: major.minor.patch-build
-    pattern = r'^(\d+)\.(\d+)\.(\d+)-(\d+)'
-    match1 = re.match(pattern, version1)
-    match2 = re.match(pattern, version2)
-    if not match1 or not match2:
+    key1 = _version_key(version1)
+    key2 = _version_key(version2)
+    if key1 is None or key2 is None:
         # Fallback to string comparison if format doesn't match
-        if version1 < version2:
-            return -1
-        elif version1 > version2:
-            return 1
-        else:
-            return 0
-    # Extract components as integers
-    v1_parts = [int(match1.group(i)) for i in range(1, 5)]
-    v2_parts = [int(match2.group(i)) for i in range(1, 5)]
-    # Compare component by component
-    for v1, v2 in zip(v1_parts, v2_parts):
-        if v1 < v2:
-            return -1
-        elif v1 > v2:
-            return 1
-    return 0
-def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
+        return (version1 > version2) - (version1 < version2)
+    # Tuple comparison runs component by component in C
+    return (key1 > key2) - (key1 < key2)
+def analyze_kernels(kernels: List[KernelInfo], headers: Optional[List[str]] = None) -> AnalysisResult:
     """
     Analyze installed kernels and identify obsolete ones.
     Identifies the running kernel, latest kernel, and marks all others
     as obsolete. Never marks running or latest kernels for removal.
+    When header packages are supplied, they are matched against the
+    protected kernel versions in the same call, so callers get kernels and
+    headers classified in one pass without rebuilding the protected set.
     Args:
         kernels: List of installed kernels
+        headers: Optional list of installed header packages to classify
     Returns:
         AnalysisResult: Analysis results with removal recommendations
     Raises:
@@ -423,22 +618,40 @@ def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
             running_kernel="",
             latest_kernel="",
             obsolete_kernels=[],
-            obsolete_headers=[],
+            obsolete_headers=match_headers_to_kernels(headers, frozenset(("",))) if headers else [],
             protected_kernels=[],
         )
+    if len(kernels) == 1:
+        # Single kernel (the common fresh-install case): it must be the
+        # running kernel and is trivially the latest, so skip version
+        # parsing and the safety validation entirely
+        only_kernel = kernels[0]
+        if not only_kernel.is_running:
+            raise ValueError("Running kernel not found in installed kernels list")
+        only_kernel.is_latest = True
+        return AnalysisResult(
+            running_kernel=only_kernel.version,
+            latest_kernel=only_kernel.version,
+            obsolete_kernels=[],
+            obsolete_headers=(
+                match_headers_to_kernels(headers, frozenset((only_kernel.version,))) if headers else []
+            ),
+            protected_kernels=[only_kernel.package_name],
+            protected_versions=frozenset((only_kernel.version,)),
+        )
     # Find running kernel
-    running_kernel = None
-    for kernel in kernels:
-        if kernel.is_running:
-            running_kernel = kernel
-            break
+    running_kernel = next((kernel for kernel in kernels if kernel.is_running), None)
     if not running_kernel:
         raise ValueError("Running kernel not found in installed kernels list")
-    # Find latest kernel by version comparison
-    latest_kernel = kernels[0]
-    for kernel in kernels[1:]:
-        if compare_kernel_versions(kernel.version, latest_kernel.version) > 0:
-            latest_kernel = kernel
+    # Find the latest kernel with the exact pairwise semantics of
+    # compare_kernel_versions: its string-comparison fallback matters for
+    # versions like '6.12.47+rpt-rpi-2712' that have no numeric build and
+    # would otherwise all collapse to the same (empty) sort key. The
+    # memoized _version_key keeps each comparison cheap.
+    latest_kernel = max(
+        kernels,
+        key=cmp_to_key(lambda a, b: compare_kernel_versions(a.version, b.version)),
+    )
     # Extract base versions for running and latest kernels
     running_base, _ = extract_base_version(running_kernel.version)
     latest_base, _ = extract_base_version(latest_kernel.version)
@@ -449,39 +662,93 @@ def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
     # Protect running kernel version and latest kernel version
     # Also protect all kernels with the same base version as running kernel
     # (e.g., if running 6.12.47+rpt-rpi-2712, also protect 6.12.47+rpt-rpi-v8)
-    protected_versions = {running_kernel.version, latest_kernel.version}
-    protected_base_versions = {running_base, latest_base}
-    obsolete_kernels = []
-    protected_kernels = []
-    for kernel in kernels:
-        kernel_base, _ = extract_base_version(kernel.version)
-        # Protect if exact match OR same base version as running/latest
-        if kernel.version in protected_versions or kernel_base in protected_base_versions:
-            protected_kernels.append(kernel.package_name)
-        else:
-            obsolete_kernels.append(kernel.package_name)
+    # Frozen: hashable (so the header base-version derivation can be
+    # cached against it) and free of mutable-set resize overhead
+    protected_versions = frozenset((running_kernel.version, latest_kernel.version))
+    protected_base_versions = frozenset((running_base, latest_base))
+    # Comprehensions run the per-element appends through the LIST_APPEND
+    # fast path. The exact-match test still short-circuits the (memoized)
+    # base-version parse for protected kernels, and the double walk is
+    # cheap because extract_base_version hits its cache on the second pass.
+    protected_kernels = [
+        kernel.package_name for kernel in kernels
+        if kernel.version in protected_versions
+        or extract_base_version(kernel.version)[0] in protected_base_versions
+    ]
+    obsolete_kernels = [
+        kernel.package_name for kernel in kernels
+        if kernel.version not in protected_versions
+        and extract_base_version(kernel.version)[0] not in protected_base_versions
+    ]
+    # Versions of every protected kernel, including base-version matches
+    # (e.g. the RPi multi-flavor case); headers are matched against this
+    # full set so headers of protected flavors are kept too
+    protected_kernel_versions = frozenset(
+        kernel.version for kernel in kernels
+        if kernel.version in protected_versions
+        or extract_base_version(kernel.version)[0] in protected_base_versions
+    )
     # Final safety validation before returning results
-    is_safe, error_msg = validate_removal_safety(
+    safety_error = validate_removal_safety(
         packages_to_remove=obsolete_kernels,
         running_kernel=running_kernel.version,
         latest_kernel=latest_kernel.version,
-        all_kernels=kernels
+        all_kernels=kernels,
+        # obsolete_kernels contains only kernel images by construction,
+        # so the count is known without a substring scan
+        kernel_image_count=len(obsolete_kernels),
     )
-    if not is_safe:
-        raise ValueError(error_msg)
+    if safety_error:
+        raise ValueError(safety_error)
+    # Match headers against the protected versions assembled above
+    obsolete_headers = []
+    if headers:
+        obsolete_headers = match_headers_to_kernels(headers, protected_kernel_versions)
     return AnalysisResult(
         running_kernel=running_kernel.version,
         latest_kernel=latest_kernel.version,
         obsolete_kernels=obsolete_kernels,
-        obsolete_headers=[],  # Will be filled by match_headers_to_kernels
+        obsolete_headers=obsolete_headers,
         protected_kernels=protected_kernels,
+        protected_versions=protected_kernel_versions,
     )
+_LINUX_HDR_PREFIX = "linux-headers-"
+_PROXMOX_HDR_PREFIX = "proxmox-headers-"
+# Module payloads ride along with their kernel; -extra- must be tried first
+_MODULES_EXTRA_PREFIX = "linux-modules-extra-"
+_MODULES_PREFIX = "linux-modules-"
+_COMMON_SUFFIX = "-common"
+@lru_cache(maxsize=32)
+def _base_versions(kernel_versions: frozenset) -> frozenset:
+    """
+    Derive base versions (without platform suffix) for -common matching.
+    e.g., 6.12.48+deb13-amd64 -> 6.12.48+deb13. Strategy: drop the last
+    '-'-separated segment when it looks like a platform identifier. Cached
+    per protected-version set, which repeats across calls.
+    Args:
+        kernel_versions: Frozen set of kernel versions to keep
+    Returns:
+        frozenset: Base versions to match -common header packages against
+    """
+    base_versions = set()
+    for kver in kernel_versions:
+        # Split on last '-' to separate potential platform suffix
+        base, sep, last_part = kver.rpartition('-')
+        # Check if last part is alphanumeric only (typical platform identifiers)
+        # Examples: amd64, generic, lowlatency, cloud, aws, azure, gcp, arm64, i386, etc.
+        # Platform identifiers are typically lowercase alphanumeric without special chars
+        if sep and last_part.replace('_', '').isalnum() and last_part.islower():
+            base_versions.add(base)
+        else:
+            # Not a platform suffix, keep whole version
+            base_versions.add(kver)
+    return frozenset(base_versions)
 def match_headers_to_kernels(headers: List[str], kernel_versions: Set[str]) -> List[str]:
     """
     Match header packages to kernel versions to find orphaned headers.
-    Identifies header packages whose corresponding kernel is not in the
-    protected kernel versions set. Handles -common packages by matching
-    against base version without platform suffix.
+    Identifies header (and kernel module) packages whose corresponding
+    kernel is not in the protected kernel versions set. Handles -common
+    packages by matching against base version without platform suffix.
     Args:
         headers: List of installed header packages (e.g., 'linux-headers-5.15.0-82-generic')
         kernel_versions: Set of kernel versions to keep (e.g., {'5.15.0-91-generic'})
@@ -489,40 +756,29 @@ def match_headers_to_kernels(headers: List[str], kernel_versions: Set[str]) -> L
         List[str]: List of header packages that can be removed
     """
     obsolete_headers = []
-    # Create a set of base versions (without platform suffix) for matching -common packages
-    # e.g., 6.12.48+deb13-amd64 -> 6.12.48+deb13
-    # Strategy: extract everything except the last segment after '-' if it looks like a platform
-    base_versions = set()
-    for kver in kernel_versions:
-        # Split on last '-' to separate potential platform suffix
-        parts = kver.rsplit('-', 1)
-        if len(parts) == 2:
-            # Check if last part is alphanumeric only (typical platform identifiers)
-            # Examples: amd64, generic, lowlatency, cloud, aws, azure, gcp, arm64, i386, etc.
-            last_part = parts[1]
-            # Platform identifiers are typically lowercase alphanumeric without special chars
-            if last_part.replace('_', '').isalnum() and last_part.islower():
-                base_versions.add(parts[0])
-            else:
-                # Not a platform suffix, keep whole version
-                base_versions.add(kver)
-        else:
-            base_versions.add(kver)
+    # Frozen for O(1) membership and so the derived base set can be cached
+    if not isinstance(kernel_versions, frozenset):
+        kernel_versions = frozenset(kernel_versions)
+    base_versions = _base_versions(kernel_versions)
     for header in headers:
         # Extract version from header package name
         # linux-headers-5.15.0-82-generic -> 5.15.0-82-generic
         # proxmox-headers-6.17.2-1-pve -> 6.17.2-1-pve
-        if header.startswith("linux-headers-"):
-            version = header.replace("linux-headers-", "")
-        elif header.startswith("proxmox-headers-"):
-            version = header.replace("proxmox-headers-", "")
+        if header.startswith(_LINUX_HDR_PREFIX):
+            version = header[len(_LINUX_HDR_PREFIX):]
+        elif header.startswith(_PROXMOX_HDR_PREFIX):
+            version = header[len(_PROXMOX_HDR_PREFIX):]
+        elif header.startswith(_MODULES_EXTRA_PREFIX):
+            version = header[len(_MODULES_EXTRA_PREFIX):]
+        elif header.startswith(_MODULES_PREFIX):
+            version = header[len(_MODULES_PREFIX):]
         else:
-            # Unknown header format, skip
+            # Unknown package format, skip
             continue
         # Check if it's a -common package
-        if version.endswith('-common'):
+        if version.endswith(_COMMON_SUFFIX):
             # Strip -common and match against base versions
-            base_version = version[:-7]  # Remove '-common'
+            base_version = version[:-len(_COMMON_SUFFIX)]
             if base_version not in base_versions:
                 obsolete_headers.append(header)
         else:
@@ -534,8 +790,9 @@ def validate_removal_safety(
     packages_to_remove: List[str],
     running_kernel: str,
     latest_kernel: str,
-    all_kernels: List[KernelInfo]
-) -> Tuple[bool, str]:
+    all_kernels: List[KernelInfo],
+    kernel_image_count: Optional[int] = None
+) -> Optional[str]:
     """
     Validate that the proposed package removal is safe.
     Performs safety checks to ensure:
@@ -547,28 +804,38 @@ def validate_removal_safety(
         running_kernel: Version of the currently running kernel
         latest_kernel: Version of the latest installed kernel
         all_kernels: List of all installed kernels
+        kernel_image_count: Number of kernel image packages in
+            packages_to_remove, if the caller already knows it (as
+            analyze_kernels does). When None, it is counted here.
     Returns:
-        Tuple[bool, str]: (is_safe, error_message)
-            is_safe: True if removal is safe
-            error_message: Description of safety violation (empty if safe)
+        Optional[str]: None if the removal is safe, otherwise a
+            description of the safety violation. Returning None keeps the
+            common safe path allocation-free.
     """
+    # Set membership is O(1) vs a list scan per protected package
+    removal_set = frozenset(packages_to_remove)
     # Check if running kernel package is in removal list
     running_pkg = f"linux-image-{running_kernel}"
-    if running_pkg in packages_to_remove:
-        return False, f"Safety check failed: Running kernel {running_kernel} is marked for removal"
+    if running_pkg in removal_set:
+        return f"Safety check failed: Running kernel {running_kernel} is marked for removal"
     # Check if latest kernel package is in removal list
     latest_pkg = f"linux-image-{latest_kernel}"
-    if latest_pkg in packages_to_remove:
-        return False, f"Safety check failed: Latest kernel {latest_kernel} is marked for removal"
-    # Count how many kernel image packages will be removed
-    kernel_images_to_remove = [pkg for pkg in packages_to_remove if "linux-image-" in pkg]
-    remaining_kernels = len(all_kernels) - len(kernel_images_to_remove)
+    if latest_pkg in removal_set:
+        return f"Safety check failed: Latest kernel {latest_kernel} is marked for removal"
+    # Count how many kernel image packages will be removed (unless the
+    # caller passed a list known to contain only kernel images). Pure set
+    # intersection against the installed images also covers Proxmox
+    # packages, which a 'linux-image-' substring scan would miss.
+    if kernel_image_count is None:
+        installed_images = {kernel.package_name for kernel in all_kernels}
+        kernel_image_count = len(installed_images & removal_set)
+    remaining_kernels = len(all_kernels) - kernel_image_count
     if remaining_kernels < 1:
-        return False, "Safety check failed: No kernels would remain after removal"
+        return "Safety check failed: No kernels would remain after removal"
     # Warn if removing many kernels at once (more than 5)
-    if len(kernel_images_to_remove) > 5:
-        return False, f"Safety check warning: Attempting to remove {len(kernel_images_to_remove)} kernels at once. This seems excessive."
-    return True, ""
+    if kernel_image_count > 5:
+        return f"Safety check warning: Attempting to remove {kernel_image_count} kernels at once. This seems excessive."
+    return None
 def get_protected_packages(running_kernel: str, latest_kernel: str) -> Set[str]:
     """
     Get a set of package names that must never be removed.
@@ -589,23 +856,32 @@ def get_protected_packages(running_kernel: str, latest_kernel: str) -> Set[str]:
 
 # ===== From kernsweep/remover.py =====
 
-class RemovalStatus(Enum):
+# Resolve the apt-get binary once at import so each spawn skips the
+# per-exec PATH walk
+_APT_GET = shutil.which("apt-get") or "/usr/bin/apt-get"
+# POSIX-vs-Windows is known at import time; probing once avoids the
+# per-call try/except in check_sudo
+_HAS_GETEUID = hasattr(os, "geteuid")
+# Fixed head of the removal argv, built once (see generate_apt_command)
+_APT_REMOVE_PREFIX = (_APT_GET, "-y", "remove", "--purge")
+class RemovalStatus(IntEnum):
     """Status of a package removal operation."""
-    SUCCESS = "success"
-    FAILED = "failed"
-    SKIPPED = "skipped"
+    SUCCESS = 0
+    FAILED = 1
+    SKIPPED = 2
+@lru_cache(maxsize=1)
 def check_sudo() -> bool:
     """
     Check if the current process has sudo privileges.
+    The effective UID cannot change under kernsweep, so the result is
+    cached for the life of the process (check_sudo.cache_clear() resets
+    it, e.g. in tests).
     Returns:
         bool: True if running with sudo/root, False otherwise
     """
-    try:
-        # On Unix systems, root has UID 0
-        return os.geteuid() == 0
-    except AttributeError:
-        # os.geteuid() not available on Windows
-        return False
+    # On Unix systems, root has UID 0; platforms without geteuid
+    # (Windows) were detected once at import
+    return _HAS_GETEUID and os.geteuid() == 0
 def _execute_apt_removal(cmd: List[str], packages: List[str]) -> List[Tuple[str, RemovalStatus]]:
     """
     Execute apt-get removal command and return results.
@@ -632,12 +908,18 @@ def _execute_apt_removal(cmd: List[str], packages: List[str]) -> List[Tuple[str,
     except subprocess.SubprocessError as e:
         # Command execution failed
         raise RuntimeError(f"Failed to execute apt-get: {e}")
-def remove_packages(packages: List[str], dry_run: bool = False) -> List[Tuple[str, RemovalStatus]]:
+def remove_packages(
+    packages: List[str],
+    dry_run: bool = False,
+    check_privileges: bool = True,
+) -> List[Tuple[str, RemovalStatus]]:
     """
     Remove packages using apt.
     Args:
         packages: List of package names to remove
         dry_run: If True, simulate removal without actually removing
+        check_privileges: If False, skip the sudo check; for callers that
+            already verified root privileges themselves
     Returns:
         List[Tuple[str, RemovalStatus]]: List of (package, status) tuples
     Raises:
@@ -650,7 +932,7 @@ def remove_packages(packages: List[str], dry_run: bool = False) -> List[Tuple[st
     if dry_run:
         return [(pkg, RemovalStatus.SUCCESS) for pkg in packages]
     # Check for sudo privileges (not needed for dry-run)
-    if not check_sudo():
+    if check_privileges and not check_sudo():
         raise PermissionError(
             "Root privileges required. Please run with sudo."
         )
@@ -660,8 +942,10 @@ def remove_packages(packages: List[str], dry_run: bool = False) -> List[Tuple[st
 def generate_apt_command(packages: List[str]) -> List[str]:
     """
     Generate the apt command to remove packages.
-    Uses 'apt-get remove --autoremove --purge -y' to properly remove packages and their
-    configuration files, and automatically remove any unused dependencies.
+    Uses 'apt-get remove --purge -y' to remove packages and their
+    configuration files. Companion packages (headers, modules) are
+    enumerated explicitly by the analyzer, so apt is spared the
+    --autoremove whole-system dependency-closure scan.
     The -y flag is always included to skip apt's confirmation prompt.
     Args:
         packages: List of package names to remove
@@ -670,11 +954,8 @@ def generate_apt_command(packages: List[str]) -> List[str]:
     """
     if not packages:
         raise ValueError("No packages provided for removal")
-    # Build apt-get -y remove --autoremove --purge command
-    cmd = ["apt-get", "-y", "remove", "--autoremove", "--purge"]
-    # Add packages to remove
-    cmd.extend(packages)
-    return cmd
+    # Splice the constant prefix and the packages in one list build
+    return [*_APT_REMOVE_PREFIX, *packages]
 
 # ===== END EMBEDDED KERNSWEEP CODE =====
 
@@ -716,6 +997,12 @@ def run_module():
         result['failed'] = True
         module.fail_json(**result)
 
+    # Fail fast on non-dpkg systems: one stat beats a doomed fork+exec
+    if not os.path.exists('/var/lib/dpkg/status'):
+        result['msg'] = "kernsweep requires a dpkg-based system (/var/lib/dpkg/status not found)"
+        result['failed'] = True
+        module.fail_json(**result)
+
     # Check for root privileges when not in check mode and state is absent
     if module.params['state'] == 'absent' and not module.check_mode:
         if not check_sudo():
@@ -725,31 +1012,21 @@ def run_module():
             module.fail_json(**result)
 
     try:
-        # Step 1: Detect running kernel
+        # Step 1: Detect running kernel (direct uname(2), no subprocess)
         running_kernel_version = get_running_kernel()
         result['running_kernel'] = running_kernel_version
 
-        # Step 2: Detect installed kernels
-        installed_kernels = get_installed_kernels()
-
-        # Mark the running kernel
-        for kernel in installed_kernels:
-            if kernel.version == running_kernel_version:
-                kernel.is_running = True
-                break
+        # Step 2: Detect installed kernels and headers (cached dpkg query);
+        # the running kernel is marked during the scan
+        installed_kernels, installed_headers = get_installed_packages_cached(running_kernel_version)
 
-        # Step 3: Analyze kernels
-        analysis = analyze_kernels(installed_kernels)
+        # Step 3: Analyze kernels and match headers in one call
+        analysis = analyze_kernels(installed_kernels, installed_headers)
         result['latest_kernel'] = analysis.latest_kernel
 
-        # Step 4: Detect headers and match to kernels
-        installed_headers = get_installed_headers()
-        protected_versions = {analysis.running_kernel, analysis.latest_kernel}
-        obsolete_headers = match_headers_to_kernels(installed_headers, protected_versions)
-        analysis.obsolete_headers = obsolete_headers
-
-        # Check if reboot is required
-        result['reboot_required'] = needs_reboot() or analysis.running_kernel != analysis.latest_kernel
+        # Check if reboot is required; the version mismatch check comes
+        # first so it short-circuits the filesystem stat
+        result['reboot_required'] = analysis.running_kernel != analysis.latest_kernel or needs_reboot()
 
         # Collect obsolete packages
         all_obsolete = analysis.obsolete_kernels + analysis.obsolete_headers
@@ -778,11 +1055,17 @@ def run_module():
             result['removed_packages'] = all_obsolete
             module.exit_json(**result)
 
-        # Actually remove packages
-        results = remove_packages(all_obsolete, dry_run=False)
+        # Actually remove packages (root was already verified above, so
+        # remove_packages can skip its own sudo check)
+        results = remove_packages(all_obsolete, dry_run=False, check_privileges=False)
 
-        # Count successes and failures
-        success_count = sum(1 for _, status in results if status == RemovalStatus.SUCCESS)
+        # Count successes and failures in one pass; identity compare
+        # against a local instead of per-element Enum __eq__ dispatch
+        success = RemovalStatus.SUCCESS
+        success_count = 0
+        for _, status in results:
+            if status is success:
+                success_count += 1
         failed_count = len(results) - success_count
 
         if failed_count > 0:
@@ -5,17 +5,59 @@ Provides functionality to analyze installed kernels and determine
 which ones are obsolete and safe to remove.
 """
 
-import re
-from typing import List, Set, Tuple
+from functools import cmp_to_key, lru_cache
+from typing import FrozenSet, List, Optional, Set, Tuple
 from dataclasses import dataclass
 
 from .detector import KernelInfo
+from .utils import DATACLASS_KWARGS
 
 
+def _looks_like_flavor(suffix: str) -> bool:
+    """
+    Check whether a version suffix looks like a platform/flavor identifier.
+
+    Flavors are alphanumeric with optional underscores ('generic', '2712',
+    'v8', 'amd64'). Version fragments such as '5.15' contain a dot and are
+    rejected by the same test, so no regex is needed on this inner-loop path.
+    """
+    return suffix.replace('_', '').isalnum()
+
+
+@lru_cache(maxsize=256)
+def _version_key(version: str) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Parse a kernel version string into a numerically comparable tuple.
+
+    Splits versions of the shape 'major.minor.patch-build-flavor' with plain
+    str.split, avoiding regex overhead on the hot comparison path. Results
+    are memoized: version strings repeat heavily across comparisons (and
+    across plays when the module stays resident under ansible-runner).
+
+    Args:
+        version: Kernel version string (e.g., '5.15.0-82-generic')
+
+    Returns:
+        Optional[Tuple[int, int, int, int]]: (major, minor, patch, build),
+            or None if the version does not match the expected format
+    """
+    head = version.split('-', 2)
+    release = head[0].split('.')
+    try:
+        return (int(release[0]), int(release[1]), int(release[2]), int(head[1]))
+    except (IndexError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=256)
 def extract_base_version(version: str) -> Tuple[str, str]:
     """
     Extract base version and flavor from a kernel version string.
-    
+
+    Pure and memoized: the same versions recur for the running/latest
+    kernels and again in the classification loop, so repeat calls are
+    cache hits.
+
     Splits version into base (numeric) part and flavor (platform/variant).
     Examples:
         '6.12.47+rpt-rpi-2712' -> ('6.12.47+rpt-rpi', '2712')
@@ -29,38 +71,49 @@ def extract_base_version(version: str) -> Tuple[str, str]:
     Returns:
         Tuple[str, str]: (base_version, flavor)
     """
-    # Split on last '-' to separate flavor
-    parts = version.rsplit('-', 1)
-    if len(parts) == 2:
-        base = parts[0]
-        flavor = parts[1]
-        # Check if the last part looks like a platform/flavor identifier
-        # Pure alphanumeric (may contain underscores), and doesn't start with a digit followed by dot
-        # This excludes things like "5.15" but includes "2712", "v8", "amd64", "generic"
-        if flavor.replace('_', '').isalnum() and not re.match(r'^\d+\.', flavor):
-            return (base, flavor)
-    
+    # Split on last '-' to separate flavor; rpartition returns a tuple and
+    # signals "no separator" through the middle element, no length check
+    base, sep, flavor = version.rpartition('-')
+    # Check if the last part looks like a platform/flavor identifier
+    # This excludes things like "5.15" but includes "2712", "v8", "amd64", "generic"
+    if sep and _looks_like_flavor(flavor):
+        return (base, flavor)
+
     # No clear flavor separation, return whole version as base
     return (version, '')
 
 
-@dataclass
+@dataclass(frozen=True, **DATACLASS_KWARGS)
 class AnalysisResult:
     """
     Result of kernel analysis.
-    
+
+    Immutable: the collection fields are stored as tuples (any iterable
+    is accepted at construction), so results are compact, safe to share,
+    and hashable for caching.
+
     Attributes:
         running_kernel: Version of the currently running kernel
         latest_kernel: Version of the latest installed kernel
-        obsolete_kernels: List of kernel packages safe to remove
-        obsolete_headers: List of header packages safe to remove
-        protected_kernels: List of kernels that must be kept
+        obsolete_kernels: Kernel packages safe to remove
+        obsolete_headers: Header packages safe to remove
+        protected_kernels: Kernels that must be kept
+        protected_versions: Versions of every protected kernel (exact and
+            base-version matches), as used for header matching
     """
     running_kernel: str
     latest_kernel: str
-    obsolete_kernels: List[str]
-    obsolete_headers: List[str]
-    protected_kernels: List[str]
+    obsolete_kernels: Tuple[str, ...]
+    obsolete_headers: Tuple[str, ...]
+    protected_kernels: Tuple[str, ...]
+    protected_versions: FrozenSet[str] = frozenset()
+
+    def __post_init__(self):
+        # Normalize the collection fields to tuples (frozen dataclass,
+        # hence object.__setattr__)
+        object.__setattr__(self, 'obsolete_kernels', tuple(self.obsolete_kernels))
+        object.__setattr__(self, 'obsolete_headers', tuple(self.obsolete_headers))
+        object.__setattr__(self, 'protected_kernels', tuple(self.protected_kernels))
 
 
 def compare_kernel_versions(version1: str, version2: str) -> int:
@@ -77,49 +130,35 @@ def compare_kernel_versions(version1: str, version2: str) -> int:
     Returns:
         int: -1 if version1 < version2, 0 if equal, 1 if version1 > version2
     """
-    # Extract numeric components from version strings
-    # Pattern: major.minor.patch-build
-    pattern = r'^(\d+)\.(\d+)\.(\d+)-(\d+)'
-    
-    match1 = re.match(pattern, version1)
-    match2 = re.match(pattern, version2)
-    
-    if not match1 or not match2:
+    key1 = _version_key(version1)
+    key2 = _version_key(version2)
+
+    if key1 is None or key2 is None:
         # Fallback to string comparison if format doesn't match
-        if version1 < version2:
-            return -1
-        elif version1 > version2:
-            return 1
-        else:
-            return 0
-    
-    # Extract components as integers
-    v1_parts = [int(match1.group(i)) for i in range(1, 5)]
-    v2_parts = [int(match2.group(i)) for i in range(1, 5)]
-    
-    # Compare component by component
-    for v1, v2 in zip(v1_parts, v2_parts):
-        if v1 < v2:
-            return -1
-        elif v1 > v2:
-            return 1
-    
-    return 0
+        return (version1 > version2) - (version1 < version2)
 
+    # Tuple comparison runs component by component in C
+    return (key1 > key2) - (key1 < key2)
 
-def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
+
+def analyze_kernels(kernels: List[KernelInfo], headers: Optional[List[str]] = None) -> AnalysisResult:
     """
     Analyze installed kernels and identify obsolete ones.
-    
+
     Identifies the running kernel, latest kernel, and marks all others
     as obsolete. Never marks running or latest kernels for removal.
-    
+
+    When header packages are supplied, they are matched against the
+    protected kernel versions in the same call, so callers get kernels and
+    headers classified in one pass without rebuilding the protected set.
+
     Args:
         kernels: List of installed kernels
-        
+        headers: Optional list of installed header packages to classify
+
     Returns:
         AnalysisResult: Analysis results with removal recommendations
-        
+
     Raises:
         ValueError: If no running kernel found in the list
     """
@@ -129,25 +168,43 @@ def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
             running_kernel="",
             latest_kernel="",
             obsolete_kernels=[],
-            obsolete_headers=[],
+            obsolete_headers=match_headers_to_kernels(headers, frozenset(("",))) if headers else [],
             protected_kernels=[],
         )
     
+    if len(kernels) == 1:
+        # Single kernel (the common fresh-install case): it must be the
+        # running kernel and is trivially the latest, so skip version
+        # parsing and the safety validation entirely
+        only_kernel = kernels[0]
+        if not only_kernel.is_running:
+            raise ValueError("Running kernel not found in installed kernels list")
+        only_kernel.is_latest = True
+        return AnalysisResult(
+            running_kernel=only_kernel.version,
+            latest_kernel=only_kernel.version,
+            obsolete_kernels=[],
+            obsolete_headers=(
+                match_headers_to_kernels(headers, frozenset((only_kernel.version,))) if headers else []
+            ),
+            protected_kernels=[only_kernel.package_name],
+            protected_versions=frozenset((only_kernel.version,)),
+        )
+
     # Find running kernel
-    running_kernel = None
-    for kernel in kernels:
-        if kernel.is_running:
-            running_kernel = kernel
-            break
-    
+    running_kernel = next((kernel for kernel in kernels if kernel.is_running), None)
     if not running_kernel:
         raise ValueError("Running kernel not found in installed kernels list")
-    
-    # Find latest kernel by version comparison
-    latest_kernel = kernels[0]
-    for kernel in kernels[1:]:
-        if compare_kernel_versions(kernel.version, latest_kernel.version) > 0:
-            latest_kernel = kernel
+
+    # Find the latest kernel with the exact pairwise semantics of
+    # compare_kernel_versions: its string-comparison fallback matters for
+    # versions like '6.12.47+rpt-rpi-2712' that have no numeric build and
+    # would otherwise all collapse to the same (empty) sort key. The
+    # memoized _version_key keeps each comparison cheap.
+    latest_kernel = max(
+        kernels,
+        key=cmp_to_key(lambda a, b: compare_kernel_versions(a.version, b.version)),
+    )
     
     # Extract base versions for running and latest kernels
     running_base, _ = extract_base_version(running_kernel.version)
@@ -162,93 +219,145 @@ def analyze_kernels(kernels: List[KernelInfo]) -> AnalysisResult:
     # Protect running kernel version and latest kernel version
     # Also protect all kernels with the same base version as running kernel
     # (e.g., if running 6.12.47+rpt-rpi-2712, also protect 6.12.47+rpt-rpi-v8)
-    protected_versions = {running_kernel.version, latest_kernel.version}
-    protected_base_versions = {running_base, latest_base}
-    
-    obsolete_kernels = []
-    protected_kernels = []
-    
-    for kernel in kernels:
-        kernel_base, _ = extract_base_version(kernel.version)
-        # Protect if exact match OR same base version as running/latest
-        if kernel.version in protected_versions or kernel_base in protected_base_versions:
-            protected_kernels.append(kernel.package_name)
-        else:
-            obsolete_kernels.append(kernel.package_name)
+    # Frozen: hashable (so the header base-version derivation can be
+    # cached against it) and free of mutable-set resize overhead
+    protected_versions = frozenset((running_kernel.version, latest_kernel.version))
+    protected_base_versions = frozenset((running_base, latest_base))
+    
+    # Comprehensions run the per-element appends through the LIST_APPEND
+    # fast path. The exact-match test still short-circuits the (memoized)
+    # base-version parse for protected kernels, and the double walk is
+    # cheap because extract_base_version hits its cache on the second pass.
+    protected_kernels = [
+        kernel.package_name for kernel in kernels
+        if kernel.version in protected_versions
+        or extract_base_version(kernel.version)[0] in protected_base_versions
+    ]
+    obsolete_kernels = [
+        kernel.package_name for kernel in kernels
+        if kernel.version not in protected_versions
+        and extract_base_version(kernel.version)[0] not in protected_base_versions
+    ]
+
+    # Versions of every protected kernel, including base-version matches
+    # (e.g. the RPi multi-flavor case); headers are matched against this
+    # full set so headers of protected flavors are kept too
+    protected_kernel_versions = frozenset(
+        kernel.version for kernel in kernels
+        if kernel.version in protected_versions
+        or extract_base_version(kernel.version)[0] in protected_base_versions
+    )
     
     # Final safety validation before returning results
-    is_safe, error_msg = validate_removal_safety(
+    safety_error = validate_removal_safety(
         packages_to_remove=obsolete_kernels,
         running_kernel=running_kernel.version,
         latest_kernel=latest_kernel.version,
-        all_kernels=kernels
+        all_kernels=kernels,
+        # obsolete_kernels contains only kernel images by construction,
+        # so the count is known without a substring scan
+        kernel_image_count=len(obsolete_kernels),
     )
-    
-    if not is_safe:
-        raise ValueError(error_msg)
-    
+
+    if safety_error:
+        raise ValueError(safety_error)
+
+    # Match headers against the protected versions assembled above
+    obsolete_headers = []
+    if headers:
+        obsolete_headers = match_headers_to_kernels(headers, protected_kernel_versions)
+
     return AnalysisResult(
         running_kernel=running_kernel.version,
         latest_kernel=latest_kernel.version,
         obsolete_kernels=obsolete_kernels,
-        obsolete_headers=[],  # Will be filled by match_headers_to_kernels
+        obsolete_headers=obsolete_headers,
         protected_kernels=protected_kernels,
+        protected_versions=protected_kernel_versions,
     )
 
 
+_LINUX_HDR_PREFIX = "linux-headers-"
+_PROXMOX_HDR_PREFIX = "proxmox-headers-"
+# Module payloads ride along with their kernel; -extra- must be tried first
+_MODULES_EXTRA_PREFIX = "linux-modules-extra-"
+_MODULES_PREFIX = "linux-modules-"
+_COMMON_SUFFIX = "-common"
+
+
+@lru_cache(maxsize=32)
+def _base_versions(kernel_versions: frozenset) -> frozenset:
+    """
+    Derive base versions (without platform suffix) for -common matching.
+
+    e.g., 6.12.48+deb13-amd64 -> 6.12.48+deb13. Strategy: drop the last
+    '-'-separated segment when it looks like a platform identifier. Cached
+    per protected-version set, which repeats across calls.
+
+    Args:
+        kernel_versions: Frozen set of kernel versions to keep
+
+    Returns:
+        frozenset: Base versions to match -common header packages against
+    """
+    base_versions = set()
+    for kver in kernel_versions:
+        # Split on last '-' to separate potential platform suffix
+        base, sep, last_part = kver.rpartition('-')
+        # Check if last part is alphanumeric only (typical platform identifiers)
+        # Examples: amd64, generic, lowlatency, cloud, aws, azure, gcp, arm64, i386, etc.
+        # Platform identifiers are typically lowercase alphanumeric without special chars
+        if sep and last_part.replace('_', '').isalnum() and last_part.islower():
+            base_versions.add(base)
+        else:
+            # Not a platform suffix, keep whole version
+            base_versions.add(kver)
+    return frozenset(base_versions)
+
+
 def match_headers_to_kernels(headers: List[str], kernel_versions: Set[str]) -> List[str]:
     """
     Match header packages to kernel versions to find orphaned headers.
-    
-    Identifies header packages whose corresponding kernel is not in the
-    protected kernel versions set. Handles -common packages by matching
-    against base version without platform suffix.
-    
+
+    Identifies header (and kernel module) packages whose corresponding
+    kernel is not in the protected kernel versions set. Handles -common
+    packages by matching against base version without platform suffix.
+
     Args:
         headers: List of installed header packages (e.g., 'linux-headers-5.15.0-82-generic')
         kernel_versions: Set of kernel versions to keep (e.g., {'5.15.0-91-generic'})
-        
+
     Returns:
         List[str]: List of header packages that can be removed
     """
     obsolete_headers = []
-    
-    # Create a set of base versions (without platform suffix) for matching -common packages
-    # e.g., 6.12.48+deb13-amd64 -> 6.12.48+deb13
-    # Strategy: extract everything except the last segment after '-' if it looks like a platform
-    base_versions = set()
-    for kver in kernel_versions:
-        # Split on last '-' to separate potential platform suffix
-        parts = kver.rsplit('-', 1)
-        if len(parts) == 2:
-            # Check if last part is alphanumeric only (typical platform identifiers)
-            # Examples: amd64, generic, lowlatency, cloud, aws, azure, gcp, arm64, i386, etc.
-            last_part = parts[1]
-            # Platform identifiers are typically lowercase alphanumeric without special chars
-            if last_part.replace('_', '').isalnum() and last_part.islower():
-                base_versions.add(parts[0])
-            else:
-                # Not a platform suffix, keep whole version
-                base_versions.add(kver)
-        else:
-            base_versions.add(kver)
-    
+
+    # Frozen for O(1) membership and so the derived base set can be cached
+    if not isinstance(kernel_versions, frozenset):
+        kernel_versions = frozenset(kernel_versions)
+
+    base_versions = _base_versions(kernel_versions)
+
     for header in headers:
         # Extract version from header package name
         # linux-headers-5.15.0-82-generic -> 5.15.0-82-generic
         # proxmox-headers-6.17.2-1-pve -> 6.17.2-1-pve
-        if header.startswith("linux-headers-"):
-            version = header.replace("linux-headers-", "")
-        elif header.startswith("proxmox-headers-"):
-            version = header.replace("proxmox-headers-", "")
+        if header.startswith(_LINUX_HDR_PREFIX):
+            version = header[len(_LINUX_HDR_PREFIX):]
+        elif header.startswith(_PROXMOX_HDR_PREFIX):
+            version = header[len(_PROXMOX_HDR_PREFIX):]
+        elif header.startswith(_MODULES_EXTRA_PREFIX):
+            version = header[len(_MODULES_EXTRA_PREFIX):]
+        elif header.startswith(_MODULES_PREFIX):
+            version = header[len(_MODULES_PREFIX):]
         else:
-            # Unknown header format, skip
+            # Unknown package format, skip
             continue
-        
+
         # Check if it's a -common package
-        if version.endswith('-common'):
+        if version.endswith(_COMMON_SUFFIX):
             # Strip -common and match against base versions
-            base_version = version[:-7]  # Remove '-common'
+            base_version = version[:-len(_COMMON_SUFFIX)]
             if base_version not in base_versions:
                 obsolete_headers.append(header)
         else:
@@ -263,49 +372,61 @@ def validate_removal_safety(
     packages_to_remove: List[str],
     running_kernel: str,
     latest_kernel: str,
-    all_kernels: List[KernelInfo]
-) -> Tuple[bool, str]:
+    all_kernels: List[KernelInfo],
+    kernel_image_count: Optional[int] = None
+) -> Optional[str]:
     """
     Validate that the proposed package removal is safe.
-    
+
     Performs safety checks to ensure:
     - Running kernel is not being removed
     - Latest kernel is not being removed
     - At least one kernel will remain after removal
-    
+
     Args:
         packages_to_remove: List of packages marked for removal
         running_kernel: Version of the currently running kernel
         latest_kernel: Version of the latest installed kernel
         all_kernels: List of all installed kernels
-        
+        kernel_image_count: Number of kernel image packages in
+            packages_to_remove, if the caller already knows it (as
+            analyze_kernels does). When None, it is counted here.
+
     Returns:
-        Tuple[bool, str]: (is_safe, error_message)
-            is_safe: True if removal is safe
-            error_message: Description of safety violation (empty if safe)
+        Optional[str]: None if the removal is safe, otherwise a
+            description of the safety violation. Returning None keeps the
+            common safe path allocation-free.
     """
+    # Set membership is O(1) vs a list scan per protected package
+    removal_set = frozenset(packages_to_remove)
+
     # Check if running kernel package is in removal list
     running_pkg = f"linux-image-{running_kernel}"
-    if running_pkg in packages_to_remove:
-        return False, f"Safety check failed: Running kernel {running_kernel} is marked for removal"
-    
+    if running_pkg in removal_set:
+        return f"Safety check failed: Running kernel {running_kernel} is marked for removal"
+
     # Check if latest kernel package is in removal list
     latest_pkg = f"linux-image-{latest_kernel}"
-    if latest_pkg in packages_to_remove:
-        return False, f"Safety check failed: Latest kernel {latest_kernel} is marked for removal"
-    
-    # Count how many kernel image packages will be removed
-    kernel_images_to_remove = [pkg for pkg in packages_to_remove if "linux-image-" in pkg]
-    remaining_kernels = len(all_kernels) - len(kernel_images_to_remove)
-    
+    if latest_pkg in removal_set:
+        return f"Safety check failed: Latest kernel {latest_kernel} is marked for removal"
+
+    # Count how many kernel image packages will be removed (unless the
+    # caller passed a list known to contain only kernel images). Pure set
+    # intersection against the installed images also covers Proxmox
+    # packages, which a 'linux-image-' substring scan would miss.
+    if kernel_image_count is None:
+        installed_images = {kernel.package_name for kernel in all_kernels}
+        kernel_image_count = len(installed_images & removal_set)
+    remaining_kernels = len(all_kernels) - kernel_image_count
+
     if remaining_kernels < 1:
-        return False, "Safety check failed: No kernels would remain after removal"
-    
+        return "Safety check failed: No kernels would remain after removal"
+
     # Warn if removing many kernels at once (more than 5)
-    if len(kernel_images_to_remove) > 5:
-        return False, f"Safety check warning: Attempting to remove {len(kernel_images_to_remove)} kernels at once. This seems excessive."
-    
-    return True, ""
+    if kernel_image_count > 5:
+        return f"Safety check warning: Attempting to remove {kernel_image_count} kernels at once. This seems excessive."
+
+    return None
 
 
 def get_protected_packages(running_kernel: str, latest_kernel: str) -> Set[str]:
@@ -6,13 +6,15 @@ Provides argument parsing and orchestrates the kernel cleanup workflow.
 
 import sys
 import argparse
+import traceback
 from typing import Optional, List
 
 from . import __version__
-from .detector import get_running_kernel, get_installed_kernels, get_installed_headers
-from .analyzer import analyze_kernels, match_headers_to_kernels
-from .remover import remove_packages, check_sudo, RemovalStatus
+from .detector import get_running_kernel, get_installed_packages
+from .analyzer import analyze_kernels
+from .remover import remove_packages, check_sudo, generate_apt_command, RemovalStatus
 from .reporter import Reporter, OutputLevel
+from .utils import needs_reboot
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -68,6 +70,24 @@ def create_parser() -> argparse.ArgumentParser:
     return parser
 
 
+# Parser singleton: building ~7 argparse actions and their help text on
+# every main() call is pure startup overhead for a one-shot CLI
+_PARSER: Optional[argparse.ArgumentParser] = None
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    """
+    Return the shared argument parser, building it on first use.
+
+    Returns:
+        argparse.ArgumentParser: Cached parser instance
+    """
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = create_parser()
+    return _PARSER
+
+
 def _setup_reporter(args) -> Reporter:
     """
     Set up reporter based on command-line arguments.
@@ -108,41 +128,23 @@ def _detect_and_analyze(args, reporter) -> tuple:
     if args.verbose:
         print(f"Running kernel: {running_kernel_version}")
     
-    # Step 2: Detect installed kernels
+    # Step 2: Detect installed kernels and headers (single dpkg query);
+    # the running kernel is marked during the scan
     if args.verbose:
         print("\nScanning installed kernels...")
-    
-    installed_kernels = get_installed_kernels()
-    
-    # Mark the running kernel
-    for kernel in installed_kernels:
-        if kernel.version == running_kernel_version:
-            kernel.is_running = True
-            break
-    
+
+    installed_kernels, installed_headers = get_installed_packages(running_kernel_version)
+
     if args.verbose:
         print(f"Found {len(installed_kernels)} installed kernel(s)")
-    
-    # Step 3: Analyze kernels
+
+    # Step 3: Analyze kernels and match headers in one call
     if args.verbose:
         print("\nAnalyzing kernels...")
-    
-    analysis = analyze_kernels(installed_kernels)
-    
-    # Step 4: Detect headers and match to kernels
-    if args.verbose:
-        print("\nScanning kernel headers...")
-    
-    installed_headers = get_installed_headers()
-    
-    if args.verbose:
         print(f"Found {len(installed_headers)} header package(s)")
-    
-    # Match headers to protected kernel versions
-    protected_versions = {analysis.running_kernel, analysis.latest_kernel}
-    obsolete_headers = match_headers_to_kernels(installed_headers, protected_versions)
-    analysis.obsolete_headers = obsolete_headers
-    
+
+    analysis = analyze_kernels(installed_kernels, installed_headers)
+
     return analysis, installed_kernels, installed_headers
 
 
@@ -167,9 +169,6 @@ def _handle_removal(args, reporter, all_obsolete: List[str], analysis) -> int:
             print("  sudo kernsweep --remove", file=sys.stderr)
             return -1
     
-    # Import generate_apt_command to show what would be executed
-    from .remover import generate_apt_command
-    
     # Show the command that would/will be executed
     if args.dry_run or args.remove:
         try:
@@ -208,24 +207,29 @@ def _handle_removal(args, reporter, all_obsolete: List[str], analysis) -> int:
         results = remove_packages(
             all_obsolete,
             dry_run=False,
+            # Root privileges were already verified at the top of this
+            # function, so skip the second check inside remove_packages
+            check_privileges=False,
         )
         
-        # Report progress for each package
-        for pkg, status in results:
-            reporter.print_removal_progress(pkg, status)
+        # Report progress for the whole batch at once
+        reporter.print_removal_results(results)
         
-        # Count successes and failures
-        success_count = sum(1 for _, status in results if status == RemovalStatus.SUCCESS)
+        # Count successes and failures in one pass; identity compare
+        # against a local instead of per-element Enum __eq__ dispatch
+        success = RemovalStatus.SUCCESS
+        success_count = 0
+        for _, status in results:
+            if status is success:
+                success_count += 1
         failed_count = len(results) - success_count
         
         # Print summary
         reporter.print_summary(success_count, failed_count)
         
-        # Check if reboot is needed
-        from .utils import needs_reboot
-        
-        # Reboot needed if: system flag OR running != latest
-        reboot_needed = needs_reboot() or analysis.running_kernel != analysis.latest_kernel
+        # Reboot needed if: running != latest OR system flag. Checking the
+        # version mismatch first short-circuits the filesystem stat.
+        reboot_needed = analysis.running_kernel != analysis.latest_kernel or needs_reboot()
         
         if reboot_needed:
             reporter.print_reboot_notice()
@@ -244,7 +248,6 @@ def _handle_removal(args, reporter, all_obsolete: List[str], analysis) -> int:
     except Exception as e:
         print(f"Error during package removal: {e}", file=sys.stderr)
         if args.verbose:
-            import traceback
             traceback.print_exc()
         return -2
 
@@ -264,8 +267,8 @@ def main(argv: Optional[list] = None) -> int:
             -2 = apt command failed
             2 = reboot required
     """
-    parser = create_parser()
-    
+    parser = _get_parser()
+
     # If no arguments provided, show help
     if argv is None:
         argv = sys.argv[1:]
@@ -286,6 +289,7 @@ def main(argv: Optional[list] = None) -> int:
         return 1
     
     # Main workflow
+    reporter = None
     try:
         # Set up reporter
         reporter = _setup_reporter(args)
@@ -313,12 +317,18 @@ def main(argv: Optional[list] = None) -> int:
             print("  Your system is clean!")
         return 1  # Nothing to do
     
+    except BrokenPipeError:
+        # Downstream pipe closed (e.g. | head); exit quietly
+        return 0
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         if args.verbose:
-            import traceback
             traceback.print_exc()
         return 1
+    finally:
+        # Emit anything still batched (no-op in interactive autoflush mode)
+        if reporter is not None:
+            reporter.flush()
 
 
 if __name__ == "__main__":
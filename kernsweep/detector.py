@@ -5,13 +5,50 @@ Provides functionality to detect the currently running kernel and
 discover all installed kernels and headers on the system.
 """
 
-import re
+import os
+import shutil
 import subprocess
-from typing import List
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 
+from .utils import DATACLASS_KWARGS
 
-@dataclass
+
+# dpkg rewrites its status file on every install/remove, so its mtime is a
+# free invalidation key for the parsed package cache
+_DPKG_STATUS_FILE = "/var/lib/dpkg/status"
+_PACKAGE_CACHE_FILE = "/var/cache/kernsweep/packages.pkl"
+# Bump when the classification rules change so caches written by older
+# versions are discarded even if the dpkg status mtime is unchanged
+_PACKAGE_CACHE_VERSION = 1
+
+# Resolve the dpkg-query binary once at import so each spawn skips the
+# per-exec PATH walk
+_DPKG_QUERY = shutil.which("dpkg-query") or "/usr/bin/dpkg-query"
+
+
+def _is_versioned(version: bytes) -> bool:
+    """Cheap meta-package filter: versions start with a digit and contain a dot."""
+    return version[:1].isdigit() and b"." in version
+
+
+def _has_three_dot_components(version: bytes) -> bool:
+    """
+    Proxmox meta-package filter: at least 'digits.digits.digits' up front.
+
+    Matches versions like 6.17.2-1-pve while rejecting two-component meta
+    names like 6.14, using only C-level split/isdigit calls.
+    """
+    parts = version.split(b".", 2)
+    return (
+        len(parts) == 3
+        and parts[0].isdigit()
+        and parts[1].isdigit()
+        and parts[2][:1].isdigit()
+    )
+
+
+@dataclass(**DATACLASS_KWARGS)
 class KernelInfo:
     """
     Information about an installed kernel.
@@ -39,152 +76,321 @@ def get_running_kernel() -> str:
         RuntimeError: If unable to detect the running kernel
     """
     try:
-        # Use uname -r to get the kernel release version
-        result = subprocess.run(
-            ["uname", "-r"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        kernel_version = result.stdout.strip()
-        
-        if not kernel_version:
-            raise RuntimeError("uname returned empty kernel version")
-        
-        return kernel_version
-    
-    except subprocess.CalledProcessError as e:
+        # uname(2) directly via os.uname() - no fork/exec of /bin/uname
+        kernel_version = os.uname().release
+    except (AttributeError, OSError) as e:
+        # AttributeError: os.uname() unavailable (non-POSIX platforms)
         raise RuntimeError(f"Failed to detect running kernel: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error detecting running kernel: {e}")
 
+    if not kernel_version:
+        raise RuntimeError("uname returned empty kernel version")
+
+    return kernel_version
 
-def get_installed_kernels() -> List[KernelInfo]:
+
+def _read_status_package_names():
     """
-    Get list of all installed kernel packages.
-    
-    Supports both standard Debian/Ubuntu (linux-image-*) and Proxmox (proxmox-kernel-*) kernels.
-    
+    Read installed kernel-related package names from dpkg's status database.
+
+    Parsing /var/lib/dpkg/status directly avoids the dpkg-query fork/exec.
+    Records are RFC822-style blocks separated by blank lines; only packages
+    in 'install ok installed' state whose names carry a kernel-related
+    prefix are returned.
+
     Returns:
-        List[KernelInfo]: List of installed kernels with metadata
-        
+        List[bytes]: Installed linux-*/proxmox-* package names
+
+    Raises:
+        OSError: If the status file cannot be read
+    """
+    with open(_DPKG_STATUS_FILE, "rb") as f:
+        data = f.read()
+
+    names = []
+    for record in data.split(b"\n\n"):
+        if not record.startswith(b"Package: "):
+            continue
+
+        newline = record.find(b"\n")
+        name = record[len(b"Package: "):newline if newline != -1 else None]
+
+        # Cheap name prefilter before scanning the record for its status
+        if not (name.startswith(b"linux-") or name.startswith(b"proxmox-")):
+            continue
+
+        if b"\nStatus: install ok installed" not in record:
+            continue
+
+        names.append(name)
+
+    return names
+
+
+def _classify_package(package_name, add_kernel, add_header, running_version):
+    """
+    Classify one installed package name into the kernel or header bucket.
+
+    Shared by the status-file and dpkg-query paths. Non-kernel packages
+    and meta-packages are ignored.
+
+    Args:
+        package_name: Raw package name (bytes)
+        add_kernel: Bound append of the kernels list
+        add_header: Bound append of the headers list
+        running_version: Version of the running kernel, if known
+    """
+    # Dispatch on the first byte ('l' vs 'p') so each name only tries the
+    # prefixes in its family
+    first = package_name[:1]
+
+    if first == b"l":
+        if package_name.startswith(b"linux-image-"):
+            # Extract version from package name
+            # linux-image-5.15.0-82-generic -> 5.15.0-82-generic
+            version = package_name[len(b"linux-image-"):]
+
+            # Skip meta-packages (generic, lowlatency, etc. without version numbers)
+            if _is_versioned(version):
+                decoded_version = version.decode("ascii")
+                add_kernel(KernelInfo(
+                    version=decoded_version,
+                    package_name=package_name.decode("ascii"),
+                    is_running=(decoded_version == running_version),
+                ))
+
+        elif package_name.startswith(b"linux-headers-"):
+            # Extract version to check if it's a specific version package
+            version = package_name[len(b"linux-headers-"):]
+
+            # Skip meta-packages (generic, lowlatency, etc. without version numbers)
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+
+        elif package_name.startswith(b"linux-modules-"):
+            # Per-kernel module payloads (linux-modules- and
+            # linux-modules-extra-); enumerated explicitly so removal
+            # does not rely on apt's --autoremove closure scan
+            if package_name.startswith(b"linux-modules-extra-"):
+                version = package_name[len(b"linux-modules-extra-"):]
+            else:
+                version = package_name[len(b"linux-modules-"):]
+
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+
+    elif first == b"p":
+        if package_name.startswith(b"proxmox-kernel-"):
+            # Example: proxmox-kernel-6.17.2-1-pve-signed
+            version = package_name[len(b"proxmox-kernel-"):]
+            if version.endswith(b"-signed"):
+                version = version[:-len(b"-signed")]
+
+            # Proxmox versions are like: 6.17.2-1-pve (at least 3 components)
+            # Skip meta-packages like proxmox-kernel-6.14 (only 2 components)
+            if _has_three_dot_components(version):
+                decoded_version = version.decode("ascii")
+                add_kernel(KernelInfo(
+                    version=decoded_version,
+                    package_name=package_name.decode("ascii"),
+                    is_running=(decoded_version == running_version),
+                ))
+
+        elif package_name.startswith(b"proxmox-headers-"):
+            # Example: proxmox-headers-6.17.2-1-pve
+            version = package_name[len(b"proxmox-headers-"):]
+
+            if _is_versioned(version):
+                add_header(package_name.decode("ascii"))
+
+
+def get_installed_packages(running_version: Optional[str] = None) -> Tuple[List[KernelInfo], List[str]]:
+    """
+    Get all installed kernel and header packages in a single pass.
+
+    Reads dpkg's status database directly when readable (no subprocess at
+    all); otherwise runs one dpkg-query invocation and scans its output
+    once. Either way, a single scan classifies
+    each installed package as a kernel image or a per-version companion
+    package (headers and module payloads). This avoids the cost of spawning
+    dpkg (and re-scanning its full output) separately per bucket.
+
+    Supports both standard Debian/Ubuntu (linux-image-*/linux-headers-*) and
+    Proxmox (proxmox-kernel-*/proxmox-headers-*) packages.
+
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running during the scan
+
+    Returns:
+        Tuple[List[KernelInfo], List[str]]: (installed kernels, header package names)
+
     Raises:
         RuntimeError: If unable to query installed packages
     """
+    kernels = []
+    headers = []
+
+    # Bind hot names to locals: the loops below then resolve them via
+    # LOAD_FAST instead of method lookups per package
+    add_kernel = kernels.append
+    add_header = headers.append
+
+    # Fast path: read dpkg's status database directly, skipping the
+    # dpkg-query fork/exec entirely; fall back to the subprocess if the
+    # file cannot be read or parsed
+    if os.access(_DPKG_STATUS_FILE, os.R_OK):
+        try:
+            for package_name in _read_status_package_names():
+                _classify_package(package_name, add_kernel, add_header, running_version)
+            return kernels, headers
+        except (OSError, UnicodeDecodeError):
+            kernels.clear()
+            headers.clear()
+
+    # Name globs push the filtering into dpkg itself, so only kernel and
+    # header packages ever cross the pipe instead of the whole database
+    cmd = [
+        _DPKG_QUERY, "-W", "-f=${db:Status-Abbrev} ${Package}\n",
+        "linux-image-*", "linux-headers-*", "linux-modules-*",
+        "proxmox-kernel-*", "proxmox-headers-*",
+    ]
+
     try:
-        # Query dpkg for installed kernel packages
-        # Format: package name, status
-        result = subprocess.run(
-            ["dpkg", "-l"],
-            capture_output=True,
-            text=True,
-            check=True,
+        # Query dpkg once for all installed packages, streaming its output
+        # so parsing overlaps with dpkg's execution and the full package
+        # list is never buffered in memory. The stream stays in bytes:
+        # package names are ASCII, so only the few matches get decoded
+        # instead of codec-scanning the whole output.
+        # Format: status abbreviation, package name
+        # stderr is discarded: dpkg-query prints a 'no packages found
+        # matching <glob>' line for every non-matching pattern (routine
+        # for the proxmox globs), which would otherwise leak to the user
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
         )
-        
-        kernels = []
-        # Pattern to match linux-image packages
-        # Example: linux-image-5.15.0-82-generic
-        linux_pattern = re.compile(r'^ii\s+(linux-image-[\d\.\-]+\S*)\s+')
-        
-        # Pattern to match proxmox-kernel packages
-        # Example: proxmox-kernel-6.17.2-1-pve-signed
-        proxmox_pattern = re.compile(r'^ii\s+(proxmox-kernel-([\d\.\-]+\S+?)(?:-signed)?)\s+')
-        
-        for line in result.stdout.splitlines():
-            # Try linux-image pattern
-            match = linux_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                # Extract version from package name
-                # linux-image-5.15.0-82-generic -> 5.15.0-82-generic
-                version = package_name.replace("linux-image-", "")
-                
-                # Skip meta-packages (generic, lowlatency, etc. without version numbers)
-                if re.match(r'^\d+\.', version):
-                    kernels.append(KernelInfo(
-                        version=version,
-                        package_name=package_name,
-                    ))
+
+        classify = _classify_package
+        for line in proc.stdout:
+            # Cheap two-byte prefilter rejects non-installed rows before
+            # any tokenization
+            if not line.startswith(b"ii"):
                 continue
-            
-            # Try proxmox-kernel pattern
-            match = proxmox_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                version = match.group(2)
-                
-                # Proxmox versions are like: 6.17.2-1-pve (at least 3 components)
-                # Skip meta-packages like proxmox-kernel-6.14 (only 2 components)
-                if re.match(r'^\d+\.\d+\.\d+', version):
-                    kernels.append(KernelInfo(
-                        version=version,
-                        package_name=package_name,
-                    ))
-        
-        # Return empty list if no kernels found (e.g., container/LXC environment)
-        return kernels
-    
+            # Expect: status abbreviation followed by package name; cap
+            # the split so trailing columns are never tokenized
+            parts = line.split(None, 2)
+            if len(parts) < 2 or parts[0] != b"ii":
+                continue
+            classify(parts[1], add_kernel, add_header, running_version)
+
+        proc.wait()
+        # dpkg-query exits 1 when a pattern matches no packages at all,
+        # which is routine (e.g. no proxmox-* on Debian/Ubuntu systems)
+        if proc.returncode not in (0, 1):
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+        # Empty lists if no kernels found (e.g., container/LXC environment)
+        return kernels, headers
+
+    except FileNotFoundError:
+        # dpkg-query missing entirely - not a dpkg-based system
+        raise RuntimeError(
+            "kernsweep requires a dpkg-based system (dpkg-query not found)"
+        )
     except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to query installed kernels: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error querying installed kernels: {e}")
+        raise RuntimeError(f"Failed to query installed packages: {e}")
+    except (OSError, subprocess.SubprocessError, UnicodeDecodeError) as e:
+        # Only environment/data failures get the friendly wrapper; genuine
+        # bugs propagate unmasked
+        raise RuntimeError(f"Unexpected error querying installed packages: {e}")
 
 
-def get_installed_headers() -> List[str]:
+def get_installed_packages_cached(running_version: Optional[str] = None) -> Tuple[List[KernelInfo], List[str]]:
     """
-    Get list of all installed kernel header packages.
-    
-    Supports both standard Debian/Ubuntu (linux-headers-*) and Proxmox (proxmox-headers-*) headers.
-    
+    Get installed kernel and header packages, reusing an on-disk cache.
+
+    The parsed package lists change only when dpkg's status file does, so
+    they are cached keyed on its mtime. Repeated runs (e.g. idempotent
+    Ansible plays across a fleet) skip the dpkg subprocess and the full
+    output scan entirely; any cache problem falls back to a fresh query.
+
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running
+
     Returns:
-        List[str]: List of kernel header package names
-        
+        Tuple[List[KernelInfo], List[str]]: (installed kernels, header package names)
+
     Raises:
         RuntimeError: If unable to query installed packages
     """
+    import pickle  # Deferred: only the caching path pays the import
+
+    status_mtime = None
     try:
-        # Query dpkg for installed header packages
-        result = subprocess.run(
-            ["dpkg", "-l"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        
-        headers = []
-        # Pattern to match linux-headers packages
-        # Example: linux-headers-5.15.0-82-generic
-        linux_pattern = re.compile(r'^ii\s+(linux-headers-[\d\.\-]+\S*)\s+')
-        
-        # Pattern to match proxmox-headers packages
-        # Example: proxmox-headers-6.17.2-1-pve
-        proxmox_pattern = re.compile(r'^ii\s+(proxmox-headers-[\d\.\-]+\S+)\s+')
-        
-        for line in result.stdout.splitlines():
-            # Try linux-headers pattern
-            match = linux_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                # Extract version to check if it's a specific version package
-                version = package_name.replace("linux-headers-", "")
-                
-                # Skip meta-packages (generic, lowlatency, etc. without version numbers)
-                if re.match(r'^\d+\.', version):
-                    headers.append(package_name)
-                continue
-            
-            # Try proxmox-headers pattern
-            match = proxmox_pattern.match(line)
-            if match:
-                package_name = match.group(1)
-                version = package_name.replace("proxmox-headers-", "")
-                
-                if re.match(r'^\d+\.', version):
-                    headers.append(package_name)
-        
-        return headers
-    
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to query installed headers: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error querying installed headers: {e}")
+        status_mtime = os.stat(_DPKG_STATUS_FILE).st_mtime
+        with open(_PACKAGE_CACHE_FILE, "rb") as f:
+            cache_version, cached_mtime, kernels, headers = pickle.load(f)
+        if cache_version == _PACKAGE_CACHE_VERSION and cached_mtime == status_mtime:
+            # Re-derive the running flag: the cache may have been written
+            # under a different (or unknown) running kernel
+            for kernel in kernels:
+                kernel.is_running = (kernel.version == running_version)
+            return kernels, headers
+    except (OSError, pickle.PickleError, EOFError, ValueError, AttributeError):
+        # Missing/stale/corrupt cache - fall through to a fresh query
+        pass
+
+    kernels, headers = get_installed_packages(running_version)
+
+    if status_mtime is not None:
+        try:
+            os.makedirs(os.path.dirname(_PACKAGE_CACHE_FILE), exist_ok=True)
+            # Write-then-rename keeps concurrent readers consistent
+            tmp_path = _PACKAGE_CACHE_FILE + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump((_PACKAGE_CACHE_VERSION, status_mtime, kernels, headers), f)
+            os.replace(tmp_path, _PACKAGE_CACHE_FILE)
+        except OSError:
+            # Cache is best-effort only (e.g. unprivileged runs)
+            pass
+
+    return kernels, headers
+
+
+def get_installed_kernels(running_version: Optional[str] = None) -> List[KernelInfo]:
+    """
+    Get list of all installed kernel packages.
+
+    Supports both standard Debian/Ubuntu (linux-image-*) and Proxmox (proxmox-kernel-*) kernels.
+
+    Args:
+        running_version: Version of the currently running kernel, if known;
+            the matching kernel is marked is_running during the scan
+
+    Returns:
+        List[KernelInfo]: List of installed kernels with metadata
+
+    Raises:
+        RuntimeError: If unable to query installed packages
+    """
+    kernels, _ = get_installed_packages(running_version)
+    return kernels
+
+
+def get_installed_headers() -> List[str]:
+    """
+    Get list of all installed kernel header and module packages.
+
+    Supports standard Debian/Ubuntu (linux-headers-*, linux-modules-*) and
+    Proxmox (proxmox-headers-*) per-version companion packages.
+
+    Returns:
+        List[str]: List of kernel header/module package names
+
+    Raises:
+        RuntimeError: If unable to query installed packages
+    """
+    _, headers = get_installed_packages()
+    return headers
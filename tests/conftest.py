@@ -0,0 +1,23 @@
+"""
+Shared pytest fixtures and helpers for the kernsweep test suite.
+"""
+
+import pytest
+
+from kernsweep.detector import KernelInfo
+
+
+def make_kernel(version: str, running: bool = False, latest: bool = False) -> KernelInfo:
+    """
+    Build a KernelInfo test record from just its version.
+
+    The package name is derived as 'linux-image-<version>' so test modules
+    don't repeat the construction boilerplate.
+    """
+    return KernelInfo(version, f"linux-image-{version}", running, latest)
+
+
+@pytest.fixture(scope="session")
+def kernel_factory():
+    """Session-scoped access to the shared KernelInfo factory."""
+    return make_kernel
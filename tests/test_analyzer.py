@@ -199,6 +199,21 @@ class TestAnalyzeKernels(unittest.TestCase):
         self.assertIn("10 kernels", str(ctx.exception))
         self.assertIn("excessive", str(ctx.exception))
     
+    def test_analyze_kernels_unparseable_versions(self):
+        """Test latest-kernel selection for versions without a numeric build."""
+        # Raspberry Pi OS style: '6.12.50+rpt-rpi-2712' has no
+        # major.minor.patch-build shape, so comparison falls back to
+        # string ordering - the newer kernel must still win
+        kernels = [
+            KernelInfo("6.12.47+rpt-rpi-2712", "linux-image-6.12.47+rpt-rpi-2712", is_running=True),
+            KernelInfo("6.12.50+rpt-rpi-2712", "linux-image-6.12.50+rpt-rpi-2712"),
+        ]
+
+        result = analyze_kernels(kernels)
+
+        self.assertEqual(result.latest_kernel, "6.12.50+rpt-rpi-2712")
+        self.assertNotIn("linux-image-6.12.50+rpt-rpi-2712", result.obsolete_kernels)
+
     def test_analyze_kernels_single_kernel_only(self):
         """Test with only one kernel (running and latest)."""
         kernels = [
@@ -5,76 +5,81 @@ Tests kernel and header detection functionality with mocked system calls.
 """
 
 import unittest
-from unittest.mock import patch, MagicMock
-import subprocess
+from unittest.mock import patch
+from io import BytesIO
+from types import SimpleNamespace
 
 from kernsweep.detector import (
     get_running_kernel,
     get_installed_kernels,
     get_installed_headers,
+    get_installed_packages,
     KernelInfo,
 )
 
 
+def _mock_dpkg_process(stdout: str) -> SimpleNamespace:
+    """Build a mocked Popen process streaming the given dpkg output."""
+    # SimpleNamespace constructs far faster than MagicMock and provides
+    # exactly the attributes the detector touches
+    return SimpleNamespace(
+        stdout=BytesIO(stdout.encode("ascii")),
+        returncode=0,
+        wait=lambda: 0,
+    )
+
+
 class TestGetRunningKernel(unittest.TestCase):
     """Tests for get_running_kernel function."""
-    
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_running_kernel_success(self, mock_run):
+
+    @patch('kernsweep.detector.os.uname')
+    def test_get_running_kernel_success(self, mock_uname):
         """Test successful kernel detection."""
-        mock_run.return_value = MagicMock(
-            stdout="5.15.0-82-generic\n",
-            returncode=0,
-        )
-        
+        mock_uname.return_value = SimpleNamespace(release="5.15.0-82-generic")
+
         result = get_running_kernel()
-        
+
         self.assertEqual(result, "5.15.0-82-generic")
-        mock_run.assert_called_once_with(
-            ["uname", "-r"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-    
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_running_kernel_empty_output(self, mock_run):
-        """Test handling of empty uname output."""
-        mock_run.return_value = MagicMock(
-            stdout="",
-            returncode=0,
-        )
-        
+        mock_uname.assert_called_once_with()
+
+    @patch('kernsweep.detector.os.uname')
+    def test_get_running_kernel_empty_output(self, mock_uname):
+        """Test handling of an empty uname release field."""
+        mock_uname.return_value = SimpleNamespace(release="")
+
         with self.assertRaises(RuntimeError) as ctx:
             get_running_kernel()
-        
+
         self.assertIn("empty", str(ctx.exception).lower())
-    
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_running_kernel_command_failure(self, mock_run):
-        """Test handling of command execution failure."""
-        mock_run.side_effect = subprocess.CalledProcessError(1, "uname")
-        
+
+    @patch('kernsweep.detector.os.uname')
+    def test_get_running_kernel_command_failure(self, mock_uname):
+        """Test handling of a failed uname syscall."""
+        mock_uname.side_effect = OSError("uname failed")
+
         with self.assertRaises(RuntimeError) as ctx:
             get_running_kernel()
-        
+
         self.assertIn("Failed to detect", str(ctx.exception))
 
 
 class TestGetInstalledKernels(unittest.TestCase):
     """Tests for get_installed_kernels function."""
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_success(self, mock_run):
+    def setUp(self):
+        """Force the dpkg-query path so the mocked subprocess is exercised."""
+        patcher = patch('kernsweep.detector.os.access', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_success(self, mock_popen):
         """Test successful kernel package detection."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
 ii  linux-image-5.15.0-91-generic   5.15.0-91.101 amd64
 ii  linux-image-generic             5.15.0.91.89  amd64
 ii  some-other-package              1.0.0         amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_kernels()
         
@@ -89,29 +94,23 @@ ii  some-other-package              1.0.0         amd64
         self.assertIn("linux-image-5.15.0-82-generic", packages)
         self.assertIn("linux-image-5.15.0-91-generic", packages)
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_no_kernels(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_no_kernels(self, mock_popen):
         """Test handling when no kernel packages found (container/LXC)."""
-        mock_run.return_value = MagicMock(
-            stdout="ii  some-other-package  1.0.0  amd64\n",
-            returncode=0,
-        )
+        mock_popen.return_value = _mock_dpkg_process("ii  some-other-package  1.0.0  amd64\n")
         
         # Should return empty list, not raise error (container environment)
         result = get_installed_kernels()
         
         self.assertEqual(len(result), 0)
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_filters_metapackages(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_filters_metapackages(self, mock_popen):
         """Test that meta-packages without versions are filtered out."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
 ii  linux-image-generic             5.15.0.91.89  amd64
 ii  linux-image-lowlatency          5.15.0.91.89  amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_kernels()
         
@@ -123,16 +122,19 @@ ii  linux-image-lowlatency          5.15.0.91.89  amd64
 class TestGetInstalledHeaders(unittest.TestCase):
     """Tests for get_installed_headers function."""
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_headers_success(self, mock_run):
+    def setUp(self):
+        """Force the dpkg-query path so the mocked subprocess is exercised."""
+        patcher = patch('kernsweep.detector.os.access', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_headers_success(self, mock_popen):
         """Test successful header package detection."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-headers-5.15.0-82-generic   5.15.0-82.91  amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-headers-5.15.0-82-generic   5.15.0-82.91  amd64
 ii  linux-headers-5.15.0-91-generic   5.15.0-91.101 amd64
 ii  linux-headers-generic             5.15.0.91.89  amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_headers()
         
@@ -140,44 +142,35 @@ ii  linux-headers-generic             5.15.0.91.89  amd64
         self.assertIn("linux-headers-5.15.0-82-generic", result)
         self.assertIn("linux-headers-5.15.0-91-generic", result)
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_headers_empty(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_headers_empty(self, mock_popen):
         """Test when no header packages are installed."""
-        mock_run.return_value = MagicMock(
-            stdout="ii  some-other-package  1.0.0  amd64\n",
-            returncode=0,
-        )
+        mock_popen.return_value = _mock_dpkg_process("ii  some-other-package  1.0.0  amd64\n")
         
         result = get_installed_headers()
         
         self.assertEqual(len(result), 0)
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_headers_filters_metapackages(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_headers_filters_metapackages(self, mock_popen):
         """Test that header meta-packages are filtered out."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-headers-5.15.0-82-generic   5.15.0-82.91  amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-headers-5.15.0-82-generic   5.15.0-82.91  amd64
 ii  linux-headers-generic             5.15.0.91.89  amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_headers()
         
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0], "linux-headers-5.15.0-82-generic")
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_headers_malformed_output(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_headers_malformed_output(self, mock_popen):
         """Test handling of malformed dpkg output."""
-        mock_run.return_value = MagicMock(
-            stdout="""broken line without proper format
+        mock_popen.return_value = _mock_dpkg_process("""broken line without proper format
 ii linux-headers-incomplete
 ii  linux-headers-5.15.0-82-generic   5.15.0-82.91  amd64
 malformed entry
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_headers()
         
@@ -189,50 +182,114 @@ malformed entry
 class TestGetInstalledKernelsEdgeCases(unittest.TestCase):
     """Additional edge case tests for kernel detection."""
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_very_long_package_name(self, mock_run):
+    def setUp(self):
+        """Force the dpkg-query path so the mocked subprocess is exercised."""
+        patcher = patch('kernsweep.detector.os.access', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_very_long_package_name(self, mock_popen):
         """Test with very long package names."""
         long_suffix = "a" * 100
-        mock_run.return_value = MagicMock(
-            stdout=f"ii  linux-image-5.15.0-82-{long_suffix}   5.15.0-82.91  amd64\n",
-            returncode=0,
-        )
+        mock_popen.return_value = _mock_dpkg_process(f"ii  linux-image-5.15.0-82-{long_suffix}   5.15.0-82.91  amd64\n")
         
         result = get_installed_kernels()
         
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].version, f"5.15.0-82-{long_suffix}")
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_mixed_architectures(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_mixed_architectures(self, mock_popen):
         """Test with multiple architectures (should only get amd64)."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64
 ii  linux-image-5.15.0-82-generic   5.15.0-82.91  i386
 ii  linux-image-5.15.0-91-generic   5.15.0-91.101 amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_kernels()
         
         # Should detect both, dpkg returns installed packages
         self.assertGreaterEqual(len(result), 2)
     
-    @patch('kernsweep.detector.subprocess.run')
-    def test_get_installed_kernels_with_whitespace_variations(self, mock_run):
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_get_installed_kernels_with_whitespace_variations(self, mock_popen):
         """Test with various whitespace patterns."""
-        mock_run.return_value = MagicMock(
-            stdout="""ii  linux-image-5.15.0-82-generic    5.15.0-82.91   amd64
+        mock_popen.return_value = _mock_dpkg_process("""ii  linux-image-5.15.0-82-generic    5.15.0-82.91   amd64
 ii   linux-image-5.15.0-91-generic  5.15.0-91.101  amd64
-""",
-            returncode=0,
-        )
+""")
         
         result = get_installed_kernels()
         
         self.assertEqual(len(result), 2)
 
 
+class TestGetInstalledPackagesFromStatusFile(unittest.TestCase):
+    """Tests for the direct dpkg status-file fast path."""
+
+    STATUS = """Package: linux-image-5.15.0-82-generic
+Status: install ok installed
+Version: 5.15.0-82.91
+
+Package: linux-image-5.15.0-75-generic
+Status: deinstall ok config-files
+Version: 5.15.0-75.82
+
+Package: linux-headers-5.15.0-82-generic
+Status: install ok installed
+Version: 5.15.0-82.91
+
+Package: linux-image-generic
+Status: install ok installed
+Version: 5.15.0.82.80
+
+Package: some-other-package
+Status: install ok installed
+Version: 1.0.0
+"""
+
+    def _write_status(self, content: str) -> str:
+        import tempfile
+        import os as _os
+        fd, path = tempfile.mkstemp()
+        with _os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(_os.unlink, path)
+        return path
+
+    def test_status_file_parse(self):
+        """Installed kernels and headers are read without a subprocess."""
+        path = self._write_status(self.STATUS)
+
+        with patch('kernsweep.detector._DPKG_STATUS_FILE', path):
+            kernels, headers = get_installed_packages()
+
+        self.assertEqual([k.package_name for k in kernels],
+                         ["linux-image-5.15.0-82-generic"])
+        self.assertEqual(headers, ["linux-headers-5.15.0-82-generic"])
+
+    def test_status_file_marks_running_kernel(self):
+        """The running kernel is tagged during the status-file scan."""
+        path = self._write_status(self.STATUS)
+
+        with patch('kernsweep.detector._DPKG_STATUS_FILE', path):
+            kernels, _ = get_installed_packages("5.15.0-82-generic")
+
+        self.assertTrue(kernels[0].is_running)
+
+    @patch('kernsweep.detector.subprocess.Popen')
+    def test_unreadable_status_file_falls_back_to_dpkg_query(self, mock_popen):
+        """A missing status file falls back to the dpkg-query subprocess."""
+        mock_popen.return_value = _mock_dpkg_process(
+            "ii  linux-image-5.15.0-82-generic   5.15.0-82.91  amd64\n"
+        )
+
+        with patch('kernsweep.detector._DPKG_STATUS_FILE', "/nonexistent/status"):
+            kernels, headers = get_installed_packages()
+
+        self.assertEqual(len(kernels), 1)
+        mock_popen.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
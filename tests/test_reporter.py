@@ -16,21 +16,22 @@ from kernsweep.analyzer import AnalysisResult
 class TestReporterOutput(unittest.TestCase):
     """Test Reporter output formatting."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.obsolete_kernels = [
+    @classmethod
+    def setUpClass(cls):
+        """Set up shared immutable fixtures once for the class."""
+        cls.obsolete_kernels = [
             "linux-image-5.15.0-82-generic",
             "linux-image-5.15.0-75-generic",
         ]
-        self.obsolete_headers = [
+        cls.obsolete_headers = [
             "linux-headers-5.15.0-82-generic",
             "linux-headers-5.15.0-75-generic",
         ]
-        self.result = AnalysisResult(
+        cls.result = AnalysisResult(
             running_kernel="5.15.0-91-generic",
             latest_kernel="5.15.0-91-generic",
-            obsolete_kernels=self.obsolete_kernels,
-            obsolete_headers=self.obsolete_headers,
+            obsolete_kernels=cls.obsolete_kernels,
+            obsolete_headers=cls.obsolete_headers,
             protected_kernels=["linux-image-5.15.0-91-generic"]
         )
     
@@ -40,6 +41,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(self.result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Reading package lists", output)
@@ -52,6 +54,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(self.result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Reading package lists", output)
@@ -64,6 +67,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(self.result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         # Quiet mode should produce no output for analysis
@@ -82,6 +86,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(empty_result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("0 to remove", output)
@@ -95,6 +100,7 @@ class TestReporterOutput(unittest.TestCase):
                 "linux-image-5.15.0-82-generic",
                 RemovalStatus.SUCCESS
             )
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Removing", output)
@@ -109,6 +115,7 @@ class TestReporterOutput(unittest.TestCase):
                 "linux-image-5.15.0-82-generic",
                 RemovalStatus.FAILED
             )
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Failed", output)
@@ -123,6 +130,7 @@ class TestReporterOutput(unittest.TestCase):
                 "linux-image-5.15.0-82-generic",
                 RemovalStatus.SKIPPED
             )
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Skipped", output)
@@ -134,6 +142,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_summary(4, 0)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Successfully removed 4 package(s)", output)
@@ -145,6 +154,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_summary(2, 2)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("Successfully removed 2 package(s)", output)
@@ -156,6 +166,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_summary(4, 0)
+            reporter.flush()
             output = fake_out.getvalue()
         
         # Summary should NOT appear in quiet mode
@@ -167,6 +178,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_reboot_notice()
+            reporter.flush()
             output = fake_out.getvalue()
 
         self.assertIn("reboot is required", output)
@@ -178,6 +190,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_reboot_notice()
+            reporter.flush()
             output = fake_out.getvalue()
         
         # Reboot notice may not show in quiet mode - just verify no crash
@@ -198,6 +211,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         # Should show kernel but NOT show reboot message
@@ -220,6 +234,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(large_result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         self.assertIn("100 to remove", output)
@@ -239,6 +254,7 @@ class TestReporterOutput(unittest.TestCase):
         
         with patch('sys.stdout', new=StringIO()) as fake_out:
             reporter.print_analysis(long_result)
+            reporter.flush()
             output = fake_out.getvalue()
         
         # Should handle long names without crashing
@@ -2,115 +2,108 @@
 Unit tests for utility functions.
 """
 
-import unittest
-from unittest.mock import patch, MagicMock
 import subprocess
+from types import SimpleNamespace
+
+import pytest
+
 from kernsweep.utils import run_command, needs_reboot
 
 
-class TestRunCommand(unittest.TestCase):
-    """Test command execution wrapper."""
-    
-    @patch('subprocess.run')
-    def test_run_command_success(self, mock_run):
-        """Test successful command execution."""
-        mock_run.return_value = MagicMock(
-            returncode=0,
-            stdout="output text",
-            stderr=""
-        )
-        
-        returncode, stdout, stderr = run_command(["echo", "test"])
-        
-        self.assertEqual(returncode, 0)
-        self.assertEqual(stdout, "output text")
-        self.assertEqual(stderr, "")
-        
-        mock_run.assert_called_once()
-        call_args = mock_run.call_args
-        self.assertEqual(call_args[0][0], ["echo", "test"])
-    
-    @patch('subprocess.run')
-    def test_run_command_failure(self, mock_run):
-        """Test failed command execution."""
-        mock_run.return_value = MagicMock(
-            returncode=1,
-            stdout="",
-            stderr="error message"
-        )
-        
-        returncode, stdout, stderr = run_command(["false"])
-        
-        self.assertEqual(returncode, 1)
-        self.assertEqual(stdout, "")
-        self.assertEqual(stderr, "error message")
-    
-    @patch('subprocess.run')
-    def test_run_command_exception_check_true(self, mock_run):
-        """Test command execution with exception and check=True (default)."""
-        mock_run.side_effect = subprocess.CalledProcessError(127, ["nonexistent"])
-        
-        with self.assertRaises(subprocess.CalledProcessError):
-            run_command(["nonexistent"])
-    
-    @patch('subprocess.run')
-    def test_run_command_exception_check_false(self, mock_run):
-        """Test command execution with exception and check=False."""
-        error = subprocess.CalledProcessError(127, ["nonexistent"])
-        error.stdout = ""
-        error.stderr = "command not found"
-        mock_run.side_effect = error
-        
-        returncode, stdout, stderr = run_command(["nonexistent"], check=False)
-        
-        self.assertEqual(returncode, 127)
-        self.assertEqual(stdout, "")
-        self.assertEqual(stderr, "command not found")
-
-
-class TestNeedsReboot(unittest.TestCase):
-    """Test reboot detection."""
-    
-    @patch('os.path.exists')
-    def test_needs_reboot_true(self, mock_exists):
-        """Test when reboot is needed."""
-        mock_exists.return_value = True
-        
-        result = needs_reboot()
-        
-        self.assertTrue(result)
-        mock_exists.assert_called_once_with("/var/run/reboot-required")
-    
-    @patch('os.path.exists')
-    def test_needs_reboot_false(self, mock_exists):
-        """Test when reboot is not needed."""
-        mock_exists.return_value = False
-        
-        result = needs_reboot()
-        
-        self.assertFalse(result)
-        mock_exists.assert_called_once_with("/var/run/reboot-required")
-    
-    @patch('os.path.exists')
-    def test_needs_reboot_oserror(self, mock_exists):
-        """Test when OS error occurs checking reboot file."""
-        mock_exists.side_effect = OSError("Permission denied")
-        
-        result = needs_reboot()
-        
-        # Should return False on error
-        self.assertFalse(result)
-    
-    @patch('os.path.exists')
-    def test_needs_reboot_permission_error(self, mock_exists):
-        """Test when permission error occurs checking reboot file."""
-        mock_exists.side_effect = PermissionError("Access denied")
-        
-        result = needs_reboot()
-        
-        # Should return False on error
-        self.assertFalse(result)
-
-
-if __name__ == "__main__":
-    unittest.main()
+@pytest.fixture(autouse=True)
+def _reset_needs_reboot_cache():
+    """Reset the process-lifetime needs_reboot cache around each test."""
+    needs_reboot.cache_clear()
+
+
+def test_run_command_success(monkeypatch):
+    """Test successful command execution."""
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        # A real CompletedProcess: cheap to build and faithful to the API
+        return subprocess.CompletedProcess(cmd, 0, "output text", "")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    returncode, stdout, stderr = run_command(["echo", "test"])
+
+    assert returncode == 0
+    assert stdout == "output text"
+    assert stderr == ""
+    assert calls == [["echo", "test"]]
+
+
+def test_run_command_failure(monkeypatch):
+    """Test failed command execution."""
+    monkeypatch.setattr(
+        subprocess, "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, "", "error message"),
+    )
+
+    returncode, stdout, stderr = run_command(["false"])
+
+    assert returncode == 1
+    assert stdout == ""
+    assert stderr == "error message"
+
+
+def test_run_command_exception_check_true(monkeypatch):
+    """Test command execution with exception and check=True (default)."""
+    def fake_run(cmd, **kwargs):
+        raise subprocess.CalledProcessError(127, ["nonexistent"])
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_command(["nonexistent"])
+
+
+def test_run_command_exception_check_false(monkeypatch):
+    """Test command execution with exception and check=False."""
+    error = subprocess.CalledProcessError(127, ["nonexistent"])
+    error.stdout = ""
+    error.stderr = "command not found"
+
+    def fake_run(cmd, **kwargs):
+        raise error
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    returncode, stdout, stderr = run_command(["nonexistent"], check=False)
+
+    assert returncode == 127
+    assert stdout == ""
+    assert stderr == "command not found"
+
+
+@pytest.mark.parametrize(
+    "stat_exc, expected",
+    [
+        # File present: reboot needed
+        (None, True),
+        # File missing: no reboot
+        (FileNotFoundError(), False),
+        # Errors while checking mean "no reboot signal"
+        (OSError("Permission denied"), False),
+        (PermissionError("Access denied"), False),
+    ],
+    ids=["present", "missing", "oserror", "permission-error"],
+)
+def test_needs_reboot(monkeypatch, stat_exc, expected):
+    """Reboot detection for present/missing/unreadable flag files."""
+    calls = []
+
+    def fake_stat(path):
+        calls.append(path)
+        if stat_exc is not None:
+            raise stat_exc
+        return SimpleNamespace()
+
+    monkeypatch.setattr("kernsweep.utils._stat", fake_stat)
+
+    result = needs_reboot()
+
+    assert calls == ["/var/run/reboot-required"]
+    assert result is expected